@@ -0,0 +1,298 @@
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from equation import linear_coefficients, parse_terms
+from simulation import TABLE_COLUMNS, Predator, Prey, is_standard
+
+# `trajectory` indexes the run within a batch (always 0 for a single run), `time` is the refined event time and
+# `value` the refined population there
+Events = namedtuple("Events", ("trajectory", "time", "value"))
+
+# Halvings of each bracketing step; 2^-40 of a step is far below the integrators' own error
+_BISECTIONS = 40
+
+
+def _coefficients(prey, predator, ndim=1):
+    # a, b, c, d of R' = aR + bRF, F' = cF + dRF, with per-trajectory arrays shaped to broadcast over time
+    for equation in (prey, predator):
+        if not is_standard(equation):
+            raise ValueError("Analytical results only apply to the standard growth + interaction form.")
+    shape = (-1,) + (1,) * (ndim - 1)
+    return tuple(np.reshape(value, shape) if np.ndim(value) else value for value in
+                 (prey.growth_rate, prey.control_rate, predator.growth_rate, predator.control_rate))
+
+
+def equilibria(prey, predator):
+    # Extinction (0, 0) and coexistence (-c/d, -a/b); the coexistence point is NaN when an interaction rate is zero
+    a, b, c, d = _coefficients(prey, predator)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coexistence = (np.where(d != 0, -c / np.where(d != 0, d, 1), np.nan),
+                       np.where(b != 0, -a / np.where(b != 0, b, 1), np.nan))
+    if not np.ndim(coexistence[0]):
+        coexistence = tuple(float(value) for value in coexistence)
+    return [(0.0, 0.0), coexistence]
+
+
+def invariant(prey_values, predator_values, prey, predator):
+    # V = dR + c ln R - bF - a ln F is constant along exact solutions; NaN once either population reaches zero
+    prey_values = np.asarray(prey_values, dtype=float)
+    predator_values = np.asarray(predator_values, dtype=float)
+    a, b, c, d = _coefficients(prey, predator, prey_values.ndim)
+    alive = (prey_values > 0) & (predator_values > 0)
+    prey_values = np.where(alive, prey_values, 1.0)
+    predator_values = np.where(alive, predator_values, 1.0)
+    value = d * prey_values + c * np.log(prey_values) - b * predator_values - a * np.log(predator_values)
+    return np.where(alive, value, np.nan)
+
+
+def invariant_drift(points, prey, predator):
+    # Change of the invariant since the first row; (steps, 3) points or batch (n, steps, 3) arrays
+    points = np.asarray(points, dtype=float)
+    values = invariant(points[..., 1], points[..., 2], prey, predator)
+    return values - values[..., :1]
+
+
+def derivatives(prey_values, predator_values, prey, predator):
+    return _rhs(prey, prey_values, predator_values), _rhs(predator, prey_values, predator_values)
+
+
+def _rhs(equation, prey_values, predator_values):
+    if not (np.ndim(equation.growth_rate) or np.ndim(equation.control_rate)):
+        return equation.rhs(prey_values, predator_values)
+    # Batch equations carry one rate per trajectory, which has to broadcast across the time axis
+    shape = (-1,) + (1,) * (np.ndim(prey_values) - 1)
+    growth_rate = np.reshape(equation.growth_rate, shape)
+    control_rate = np.reshape(equation.control_rate, shape)
+    own = prey_values if isinstance(equation, Prey) else predator_values
+    return growth_rate * own + control_rate * prey_values * predator_values
+
+
+def _hermite(y0, y1, m0, m1, h, s):
+    return ((2 * s - 3) * s * s + 1) * y0 + ((s - 2) * s + 1) * s * h * m0 + (3 - 2 * s) * s * s * y1 + \
+        (s - 1) * s * s * h * m1
+
+
+def _hermite_slope(y0, y1, m0, m1, h, s):
+    # d/ds of _hermite
+    return 6 * (s - 1) * s * (y0 - y1) + ((3 * s - 4) * s + 1) * h * m0 + (3 * s - 2) * s * h * m1
+
+
+def _bisect(function, start):
+    # Vectorised bisection on [0, 1] for brackets whose sign at 0 is `start`
+    low = np.zeros_like(start)
+    high = np.ones_like(start)
+    for _ in range(_BISECTIONS):
+        middle = (low + high) / 2
+        before = (function(middle) < 0) == (start < 0)
+        low = np.where(before, middle, low)
+        high = np.where(before, high, middle)
+    return (low + high) / 2
+
+
+def _brackets(values, direction):
+    # Steps whose end points straddle zero: upward (-1 -> 0+), downward (+1 -> 0-) or either
+    before = values[..., :-1]
+    after = values[..., 1:]
+    upward = (before < 0) & (after >= 0)
+    downward = (before > 0) & (after <= 0)
+    if direction > 0:
+        return upward
+    if direction < 0:
+        return downward
+    return upward | downward
+
+
+def crossings(times, values, slopes=None, level=0.0, direction=0):
+    # Times at which `values` crosses `level`, refined on the cubic Hermite interpolant through the samples and their
+    # slopes, or linearly when no slopes are given. `values` is (steps,) or (n, steps) over the 1-D `times`.
+    times = np.asarray(times, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    shifted = values - level
+    trajectory, step = np.nonzero(_brackets(shifted, direction))
+    y0 = shifted[trajectory, step]
+    y1 = shifted[trajectory, step + 1]
+    h = times[step + 1] - times[step]
+
+    if slopes is None:
+        fraction = y0 / (y0 - y1)
+    else:
+        slopes = np.atleast_2d(np.asarray(slopes, dtype=float))
+        m0 = slopes[trajectory, step]
+        m1 = slopes[trajectory, step + 1]
+        fraction = _bisect(lambda s: _hermite(y0, y1, m0, m1, h, s), y0)
+    return Events(trajectory, times[step] + fraction * h, np.full(len(step), float(level)))
+
+
+def extrema(times, values, slopes, kind="max"):
+    # Peaks ("max") or troughs ("min") between samples: where the slope changes sign, refined on the Hermite
+    # interpolant, with the interpolated height at that time
+    times = np.asarray(times, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    slopes = np.atleast_2d(np.asarray(slopes, dtype=float))
+    trajectory, step = np.nonzero(_brackets(slopes, -1 if kind == "max" else 1))
+    y0 = values[trajectory, step]
+    y1 = values[trajectory, step + 1]
+    m0 = slopes[trajectory, step]
+    m1 = slopes[trajectory, step + 1]
+    h = times[step + 1] - times[step]
+
+    fraction = _bisect(lambda s: _hermite_slope(y0, y1, m0, m1, h, s), m0)
+    return Events(trajectory, times[step] + fraction * h, _hermite(y0, y1, m0, m1, h, fraction))
+
+
+def extinction_time(times, values):
+    # First time a population sits on the max(0, ...) floor; NaN for runs that never get there
+    values = np.atleast_2d(values)
+    extinct = values <= 0
+    return np.where(extinct.any(axis=-1), np.asarray(times)[extinct.argmax(axis=-1)], np.nan)
+
+
+def _concatenate(events):
+    if not events:
+        return Events(np.empty(0, dtype=np.intp), np.empty(0), np.empty(0))
+    return Events(*(np.concatenate(parts) for parts in zip(*events)))
+
+
+class StreamingAnalyzer:
+    # Accumulates events and summaries one chunk at a time: (rows, 3) points, (rows, 5) tables or batch
+    # (n, rows, 3) chunks. The last row of each chunk is carried over so events between chunks are not missed.
+    def __init__(self, prey, predator, prey_levels=(), predator_levels=()):
+        self.prey = prey
+        self.predator = predator
+        self.levels = {"prey": tuple(prey_levels), "predator": tuple(predator_levels)}
+        # The invariant only exists for the standard form; custom equations skip it
+        self.conserved = is_standard(prey) and is_standard(predator)
+        self.batch = None
+        self.rows = 0
+        self._last = None
+        self._events = {}
+        self._minimum = {}
+        self._maximum = {}
+        self._extinction = {}
+        self._start_invariant = None
+        self._drift = None
+
+    def update(self, chunk):
+        chunk = np.asarray(chunk, dtype=float)
+        if self.batch is None:
+            self.batch = chunk.ndim == 3
+        if not self.batch:
+            chunk = chunk[None]
+        if not chunk.shape[1]:
+            return
+
+        predator_column = 3 if chunk.shape[2] == len(TABLE_COLUMNS) else 2
+        times = chunk[0, :, 0]
+        populations = {"prey": chunk[:, :, 1], "predator": chunk[:, :, predator_column]}
+
+        for name, values in populations.items():
+            low = values.min(axis=1)
+            high = values.max(axis=1)
+            self._minimum[name] = low if name not in self._minimum else np.fmin(self._minimum[name], low)
+            self._maximum[name] = high if name not in self._maximum else np.fmax(self._maximum[name], high)
+            extinct = extinction_time(times, values)
+            self._extinction[name] = extinct if name not in self._extinction else np.where(
+                np.isnan(self._extinction[name]), extinct, self._extinction[name])
+
+        if self.conserved:
+            values = invariant(populations["prey"], populations["predator"], self.prey, self.predator)
+            if self._start_invariant is None:
+                self._start_invariant = values[:, 0]
+                self._drift = np.zeros(len(values))
+            # NaN-skipping, so the rows after an extinction do not hide the drift that led up to it
+            change = np.abs(values - self._start_invariant[:, None])
+            self._drift = np.fmax(self._drift, np.fmax.reduce(change, axis=1, initial=0.0))
+
+        if self._last is not None:
+            times = np.concatenate([[self._last[0]], times])
+            populations = {name: np.concatenate([self._last[1][name], values], axis=1)
+                           for name, values in populations.items()}
+        self._last = (times[-1], {name: values[:, -1:] for name, values in populations.items()})
+        self.rows += chunk.shape[1]
+
+        slopes = dict(zip(("prey", "predator"), derivatives(populations["prey"], populations["predator"], self.prey,
+                                                           self.predator)))
+        for name, values in populations.items():
+            self._events.setdefault(name + "_max", []).append(extrema(times, values, slopes[name], "max"))
+            self._events.setdefault(name + "_min", []).append(extrema(times, values, slopes[name], "min"))
+            for level in self.levels[name]:
+                self._events.setdefault((name, level), []).append(crossings(times, values, slopes[name], level))
+
+    def watch(self, chunks):
+        # Analyses chunks as they pass through to another consumer, such as a file writer or a live graph
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def events(self):
+        # "prey_max", "prey_min", "predator_max", "predator_min", plus ("prey" | "predator", level) for thresholds
+        return {name: _concatenate(parts) for name, parts in self._events.items()}
+
+    def summary(self):
+        count = len(self._minimum["prey"]) if self._minimum else 0
+        peaks = _concatenate(self._events.get("prey_max", []))
+
+        # Prey peak spacing; one peak per cycle for predator-prey orbits
+        peak_count = np.bincount(peaks.trajectory, minlength=count)
+        first = np.full(count, np.inf)
+        last = np.full(count, -np.inf)
+        np.minimum.at(first, peaks.trajectory, peaks.time)
+        np.maximum.at(last, peaks.trajectory, peaks.time)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            period = np.where(peak_count >= 2, (last - first) / (peak_count - 1), np.nan)
+
+        summary = {
+            "period": period,
+            "prey_amplitude": self._maximum["prey"] - self._minimum["prey"],
+            "predator_amplitude": self._maximum["predator"] - self._minimum["predator"],
+            "prey_extinction_time": self._extinction["prey"],
+            "predator_extinction_time": self._extinction["predator"],
+            "final_prey": self._last[1]["prey"][:, 0],
+            "final_predator": self._last[1]["predator"][:, 0],
+            "invariant_drift": self._drift if self.conserved else np.full(count, np.nan),
+        }
+        if not self.batch:
+            summary = {name: float(values[0]) for name, values in summary.items()}
+        return summary
+
+
+def analyze(results, prey, predator, prey_levels=(), predator_levels=()):
+    # One-shot analysis of a whole array or iterator of chunks; returns the analyzer for its events and summary
+    analyzer = StreamingAnalyzer(prey, predator, prey_levels, predator_levels)
+    for chunk in ([results] if isinstance(results, np.ndarray) else results):
+        analyzer.update(chunk)
+    return analyzer
+
+
+def equations_from_metadata(metadata):
+    # Rebuilds the Prey and Predator of a run saved by storage.save_trajectory
+    prey_letter = metadata["prey_letter"]
+    predator_letter = metadata["predator_letter"]
+    equations = []
+    for cls, key, letter in ((Prey, "prey_equation", prey_letter), (Predator, "predator_equation", predator_letter)):
+        terms = parse_terms(metadata[key])
+        growth_rate, control_rate = linear_coefficients(terms, letter, prey_letter, predator_letter)
+        equations.append(cls(growth_rate, control_rate, prey_letter, predator_letter, metadata[key]))
+    return equations
+
+
+def main():
+    from storage import load_trajectory
+
+    for path in sys.argv[1:]:
+        trajectory = load_trajectory(path)
+        prey, predator = equations_from_metadata(trajectory.metadata)
+        analyzer = analyze(trajectory.points, prey, predator)
+        print(f"{path}:")
+        if analyzer.conserved:
+            print(f"  equilibria: {equilibria(prey, predator)}")
+        for name, value in analyzer.summary().items():
+            print(f"  {name}: {value:.6g}")
+        peaks = analyzer.events()["prey_max"]
+        print(f"  prey peaks: {', '.join(f'{height:.4f} at t={time:.4f}' for time, height in zip(peaks.time, peaks.value))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulation import Euler, Predator, Prey, RungeKutta, Visualizer
+
+# Every integrator run covers the same horizon; the step count is varied through the time step
+FINAL_TIME = 12
+DEFAULT_STEPS = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+# Table rows are formatted into an in-memory buffer, so this measures formatting rather than terminal speed
+DEFAULT_TABLE_ROWS = (10 ** 3, 10 ** 4, 10 ** 5)
+# Vertex budget of the default 800 px wide canvas in visual.draw_graph
+GRAPH_BUDGET = 8 * 800
+
+
+def _simulation(method, steps):
+    prey = Prey(3, -1.4, "R", "F")
+    predator = Predator(-1, 0.8, "R", "F")
+    return method(1, 1, prey, predator, FINAL_TIME / steps, 0, FINAL_TIME)
+
+
+def _measure(function, repeat):
+    # Best wall time over `repeat` runs, then one extra run under tracemalloc for the peak allocation
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def _cases(steps, table_rows, wanted):
+    for method in (Euler, RungeKutta):
+        for output in ("calculate_points", "calculate_table"):
+            for count in steps:
+                yield f"{method.__name__}.{output}", count, lambda m=method, o=output, c=count: getattr(
+                    _simulation(m, c), o)()
+
+    # The remaining cases need their input computed up front, so skip that work for filtered-out cases
+    if not wanted("Visualizer.print_table"):
+        table_rows = ()
+    for count in table_rows:
+        table = _simulation(RungeKutta, count).calculate_table()
+
+        def print_table(table=table):
+            with contextlib.redirect_stdout(io.StringIO()):
+                Visualizer().print_table(table)
+
+        yield "Visualizer.print_table", count, print_table
+
+    if not wanted("draw_graph.prepare"):
+        return
+    try:
+        from visual import prepare_graph_data
+    except ImportError as error:
+        print(f"Skipping draw_graph preparation: {error}", file=sys.stderr)
+        return
+
+    for count in steps:
+        points = _simulation(RungeKutta, count).calculate_points()
+        # Array conversion, decimation and the float32 vertex copy; no canvas is created
+        yield "draw_graph.prepare", count, lambda points=points: prepare_graph_data(points, GRAPH_BUDGET)
+
+
+def run(steps=DEFAULT_STEPS, table_rows=DEFAULT_TABLE_ROWS, repeat=3, only=None):
+    def wanted(name):
+        return not only or any(pattern in name for pattern in only)
+
+    results = []
+    for name, count, function in _cases(steps, table_rows, wanted):
+        if not wanted(name):
+            continue
+        seconds, peak = _measure(function, repeat)
+        results.append({"name": name, "steps": count, "seconds": seconds, "peak_bytes": peak})
+        print(f"{name:<32} {count:>10} {seconds:>10.4f}s {peak / 2 ** 20:>9.1f} MiB", file=sys.stderr)
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    # A case regresses when it is more than `threshold` (as a fraction) slower than the baseline
+    previous = {(entry["name"], entry["steps"]): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in report["results"]:
+        old = previous.get((entry["name"], entry["steps"]))
+        if old is None:
+            continue
+        entry["baseline_seconds"] = old["seconds"]
+        entry["ratio"] = entry["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        if entry["ratio"] > 1 + threshold:
+            regressions.append(entry)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the integrators, table output and graph preparation.")
+    parser.add_argument("--steps", type=lambda text: [int(float(value)) for value in text.split(",")],
+                        default=list(DEFAULT_STEPS), help="comma separated step counts, e.g. 1e3,1e5,1e7")
+    parser.add_argument("--table-rows", type=lambda text: [int(float(value)) for value in text.split(",")],
+                        default=list(DEFAULT_TABLE_ROWS), help="comma separated row counts for print_table")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the best one is reported")
+    parser.add_argument("--only", action="append", help="only run cases whose name contains this text")
+    parser.add_argument("--output", default="-", help="JSON report file, or - for stdout")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.steps, args.table_rows, args.repeat, args.only)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        report["regressions"] = len(regressions)
+        for entry in regressions:
+            print(f"REGRESSION {entry['name']} at {entry['steps']} steps: {entry['seconds']:.4f}s vs "
+                  f"{entry['baseline_seconds']:.4f}s ({entry['ratio']:.2f}x)", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import glob
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from equation import parse_terms
+from simulation import Euler, RungeKutta, Symplectic, _time_grid
+from storage import simulation_metadata
+
+# Fixed-step runs can be resumed from their last row, so a longer run reuses a shorter cached one
+_RESUMABLE = (Euler, RungeKutta, Symplectic)
+
+
+def _coefficients(equation):
+    # Like terms merged and sorted, so "3R - 1.4RF" and "-1.4RF + 3R" address the same results
+    merged = {}
+    for coefficient, factors in parse_terms(equation):
+        key = tuple(sorted(factors))
+        merged[key] = merged.get(key, 0) + coefficient
+    return sorted([list(map(list, factors)), coefficient] for factors, coefficient in merged.items() if coefficient)
+
+
+def cache_key(simulation, table=False):
+    # (family, final_time): the family hashes everything except how far the run goes
+    metadata = simulation_metadata(simulation)
+    description = {
+        "method": metadata["method"],
+        "table": table,
+        "prey": _coefficients(metadata["prey_equation"]),
+        "predator": _coefficients(metadata["predator_equation"]),
+        "letters": [metadata["prey_letter"], metadata["predator_letter"]],
+        "initial": [float(metadata["initial_prey_population"]), float(metadata["initial_predator_population"])],
+        "start_time": float(metadata["start_time"]),
+        "time_step": float(metadata.get("time_step", 0)),
+        "tolerance": float(metadata.get("tolerance", 0)),
+    }
+    if "order" in metadata:
+        description["order"] = metadata["order"]
+    if not isinstance(simulation, _RESUMABLE):
+        # Adaptive runs depend on their whole horizon and output grid, so they only ever match exactly
+        description["final_time"] = float(simulation.final_time)
+        if getattr(simulation, "output_times", None) is not None:
+            description["output_times"] = hashlib.sha256(
+                np.ascontiguousarray(simulation.output_times, dtype=float).tobytes()).hexdigest()
+
+    family = hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+    return family, float(simulation.final_time)
+
+
+class SimulationCache:
+    def __init__(self, max_memory_bytes=256 * 2 ** 20, directory=None, max_disk_bytes=2 * 2 ** 30):
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def stats(self):
+        lookups = self.hits + self.prefix_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.prefix_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
+
+    def clear(self):
+        self._memory.clear()
+        self._memory_bytes = 0
+
+    def get_points(self, simulation):
+        return self._get(simulation, table=False)
+
+    def get_table(self, simulation):
+        return self._get(simulation, table=True)
+
+    def _get(self, simulation, table):
+        family, final_time = cache_key(simulation, table)
+
+        results = self._lookup(family, final_time)
+        if results is not None:
+            self.hits += 1
+        elif isinstance(simulation, _RESUMABLE):
+            results = self._from_prefix(simulation, family, final_time, table)
+
+        if results is None:
+            self.misses += 1
+            results = simulation.calculate_table() if table else simulation.calculate_points()
+            self._store(family, final_time, results)
+        else:
+            # Leave the integrator where a fresh run would have left it
+            simulation.prey_population = results[-1, 1]
+            simulation.predator_population = results[-1, 3 if table else 2]
+
+        return results
+
+    def _lookup(self, family, final_time):
+        results = self._memory.get((family, final_time))
+        if results is not None:
+            self._memory.move_to_end((family, final_time))
+            return results
+
+        path = self._path(family, final_time)
+        if path is not None and os.path.exists(path):
+            self.disk_hits += 1
+            os.utime(path)
+            results = np.load(path)
+            self._remember(family, final_time, results)
+            return results
+        return None
+
+    def _from_prefix(self, simulation, family, final_time, table):
+        candidates = {cached_final for cached_family, cached_final in self._memory if cached_family == family}
+        if self.directory is not None:
+            for path in glob.glob(os.path.join(self.directory, family + "_*.npy")):
+                candidates.add(float.fromhex(os.path.basename(path)[len(family) + 1:-len(".npy")]))
+        if not candidates:
+            return None
+
+        longer = [cached_final for cached_final in candidates if cached_final >= final_time]
+        if longer:
+            # A longer run already holds this one: its first rows are exactly the shorter run
+            cached = self._lookup(family, min(longer))
+            rows = len(_time_grid(simulation.start_time, final_time, simulation.time_step))
+            results = cached[:rows].copy()
+        else:
+            cached = self._lookup(family, max(candidates))
+            resumed = simulation.iter_chunks(table=table, resume_from=cached[-1])
+            results = np.concatenate([cached, *resumed])
+
+        self.prefix_hits += 1
+        self._store(family, final_time, results)
+        return results
+
+    def _store(self, family, final_time, results):
+        self._remember(family, final_time, results)
+
+        path = self._path(family, final_time)
+        if path is not None:
+            np.save(path, results)
+            self._evict_disk()
+
+    def _remember(self, family, final_time, results):
+        if results.nbytes > self.max_memory_bytes:
+            return
+        # Cached arrays are shared between callers, so keep them read-only
+        results.flags.writeable = False
+        previous = self._memory.pop((family, final_time), None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[(family, final_time)] = results
+        self._memory_bytes += results.nbytes
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _path(self, family, final_time):
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, f"{family}_{final_time.hex()}.npy")
+
+    def _evict_disk(self):
+        # Oldest-used files go first; lookups touch a file's modification time
+        files = [(os.path.getmtime(path), os.path.getsize(path), path)
+                 for path in glob.glob(os.path.join(self.directory, "*.npy"))]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
@@ -0,0 +1,234 @@
+import argparse
+import sys
+
+import numpy as np
+
+import profiling
+from equation import parse_terms
+from simulation import _clamp, _time_grid, is_standard
+
+
+class Community:
+    # N interacting populations: x' = r*x + x*(A@x). Row i of `interactions` says how every species changes the
+    # per-capita growth of species i, so predation, competition and self-limitation are all just matrix entries.
+    def __init__(self, growth_rates, interactions, names=None):
+        self.growth_rates = np.asarray(growth_rates, dtype=float).ravel()
+        self.interactions = np.asarray(interactions, dtype=float)
+        size = len(self.growth_rates)
+        if self.interactions.shape != (size, size):
+            raise ValueError(f"Interactions must be a {size}x{size} matrix for {size} growth rates.")
+        self.names = tuple(names) if names is not None else tuple(f"X{i + 1}" for i in range(size))
+        if len(self.names) != size or len(set(self.names)) != size:
+            raise ValueError(f"Give {size} distinct species names.")
+
+    def __len__(self):
+        return len(self.growth_rates)
+
+    def __str__(self):
+        lines = []
+        for i, name in enumerate(self.names):
+            terms = [f"{self.growth_rates[i]:g}{name}"] if self.growth_rates[i] else []
+            terms += [f"{rate:g}{name}{other}" for rate, other in zip(self.interactions[i], self.names) if rate]
+            lines.append(f"{name}' = " + (" + ".join(terms).replace("+ -", "- ") or "0"))
+        return "\n".join(lines)
+
+    @classmethod
+    def from_pair(cls, prey, predator):
+        # The two-species model as a special case: R' = aR + bRF, F' = cF + dRF
+        for equation in (prey, predator):
+            if not is_standard(equation):
+                raise ValueError("Only the standard growth + interaction form maps onto a community.")
+        return cls((prey.growth_rate, predator.growth_rate),
+                   ((0.0, prey.control_rate), (predator.control_rate, 0.0)),
+                   (prey.prey_letter, prey.predator_letter))
+
+    def rhs(self, populations):
+        # One matrix product per evaluation; `populations` is (N,) or (N, trajectories)
+        growth_rates = self.growth_rates.reshape((-1,) + (1,) * (np.ndim(populations) - 1))
+        return populations * (growth_rates + self.interactions @ populations)
+
+    def index(self, axis):
+        # Column of `axis` in calculate_points output: "time" or 0, a species name, or a 1-based species number
+        if axis == "time":
+            return 0
+        if axis in self.names:
+            return self.names.index(axis) + 1
+        if isinstance(axis, (int, np.integer)) or str(axis).isdigit():
+            if 0 <= int(axis) <= len(self):
+                return int(axis)
+        raise ValueError(f"Unknown axis '{axis}'. Use time or one of: {', '.join(self.names)}")
+
+
+def _factors_text(factors):
+    return "".join(letter if power == 1 else f"{letter}^{power}" for letter, power in factors)
+
+
+def parse_community(equations):
+    # {"G": "1G - 0.1G^2 - 0.5GH", "H": "-0.3H + 0.2GH"} -> Community. Every term must be the species' own letter
+    # times at most one other letter (or itself squared), which is what fits r*x + x*(A@x).
+    names = tuple(equations)
+    growth_rates = np.zeros(len(names))
+    interactions = np.zeros((len(names), len(names)))
+    for i, name in enumerate(names):
+        for coefficient, factors in parse_terms(equations[name]):
+            powers = dict(factors)
+            unknown = sorted(set(powers) - set(names))
+            if unknown:
+                raise ValueError(f"Unknown variable '{unknown[0]}' in the {name} equation.")
+            if powers.get(name, 0) < 1 or sum(powers.values()) > 2:
+                raise ValueError(f"Term {coefficient:g}{_factors_text(factors)} of the {name} equation is "
+                                 f"not {name} times a rate or times one population.")
+            powers[name] -= 1
+            others = [letter for letter, power in powers.items() if power]
+            if others:
+                interactions[i, names.index(others[0])] += coefficient
+            else:
+                growth_rates[i] += coefficient
+    return Community(growth_rates, interactions, names)
+
+
+def food_chain(length, basal_growth_rate=1.0, death_rate=0.2, attack_rate=1.0, efficiency=0.5,
+               self_limitation=0.1):
+    # A basal species with logistic growth, each level above eating the one below it and dying off without food
+    growth_rates = np.full(length, -death_rate)
+    growth_rates[0] = basal_growth_rate
+    interactions = np.zeros((length, length))
+    interactions[0, 0] = -self_limitation
+    levels = np.arange(length - 1)
+    interactions[levels, levels + 1] = -attack_rate
+    interactions[levels + 1, levels] = efficiency * attack_rate
+    return Community(growth_rates, interactions)
+
+
+def competition(count, growth_rate=1.0, self_limitation=1.0, competition_rate=0.5):
+    # Lotka-Volterra competition: every species limits itself and, more weakly, all the others
+    interactions = np.full((count, count), -competition_rate)
+    np.fill_diagonal(interactions, -self_limitation)
+    return Community(np.full(count, growth_rate), interactions)
+
+
+class CommunityEuler:
+    # Evaluations of the right-hand side per step
+    _STAGES = 1
+
+    def __init__(self, community, initial_populations, time_step, start_time, final_time):
+        self.community = community
+        self.populations = np.array(initial_populations, dtype=float).ravel()
+        if len(self.populations) != len(community):
+            raise ValueError(f"Give {len(community)} initial populations, one per species.")
+        self.time_step = time_step
+        self.start_time = start_time
+        self.final_time = final_time
+
+    def __str__(self):
+        initial = ", ".join(f"{name}={value:g}" for name, value in zip(self.community.names, self.populations))
+        return (
+            f"Initial populations: {initial}\n"
+            f"Time step: {self.time_step} from {self.start_time} to {self.final_time}\n"
+            f"{self.community}"
+        )
+
+    def _step(self, populations):
+        return _clamp(populations + self.time_step * self.community.rhs(populations))
+
+    def calculate_points(self):
+        # (time, x1, ..., xN) rows; without a chunk size the first chunk is the whole run
+        return next(self.iter_chunks(chunk_size=None))
+
+    def iter_chunks(self, chunk_size=4096):
+        times = _time_grid(self.start_time, self.final_time, self.time_step)
+        chunk_size = chunk_size or len(times)
+        profiling.count(type(self).__name__ + ".rhs", self._STAGES * (len(times) - 1))
+
+        current = self.populations
+        for start in range(0, len(times), chunk_size):
+            stop = min(start + chunk_size, len(times))
+            chunk = np.empty((stop - start, 1 + len(current)))
+            chunk[:, 0] = times[start:stop]
+            for i in range(start, stop):
+                if i:
+                    current = self._step(current)
+                chunk[i - start, 1:] = current
+            self.populations = current
+            yield chunk
+
+
+class CommunityRungeKutta(CommunityEuler):
+    _STAGES = 4
+
+    def _step(self, populations):
+        h = self.time_step
+        rhs = self.community.rhs
+        k1 = rhs(populations)
+        k2 = rhs(populations + 0.5 * h * k1)
+        k3 = rhs(populations + 0.5 * h * k2)
+        k4 = rhs(populations + h * k3)
+        return _clamp(populations + h * ((k1 + 2 * k2 + 2 * k3 + k4) / 6))
+
+
+METHODS = {"euler": CommunityEuler, "runge-kutta": CommunityRungeKutta}
+
+
+def select_axes(points, community, axes=("time", 1, 2)):
+    # Any three columns of calculate_points output for the 3D graph, with their labels
+    columns = [community.index(axis) for axis in axes]
+    if len(columns) != 3:
+        raise ValueError("Pick exactly three axes to plot.")
+    labels = tuple("Time" if column == 0 else community.names[column - 1] for column in columns)
+    return np.asarray(points)[:, columns], labels
+
+
+def _parse_equation_argument(text):
+    name, _, equation = text.partition("=")
+    name = name.strip().rstrip("'")
+    if not equation or not name:
+        raise argparse.ArgumentTypeError(f"Expected NAME=EQUATION, got '{text}'.")
+    return name, equation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a community of N interacting species.")
+    model = parser.add_mutually_exclusive_group(required=True)
+    model.add_argument("--equation", type=_parse_equation_argument, action="append", metavar="NAME=EQUATION",
+                       help="one per species, e.g. --equation \"G=1G - 0.1G^2 - 0.5GH\" --equation \"H=-0.3H + 0.2GH\"")
+    model.add_argument("--food-chain", type=int, metavar="LEVELS", help="a food chain with this many levels")
+    model.add_argument("--competition", type=int, metavar="SPECIES", help="this many competing species")
+    parser.add_argument("--initial", type=lambda text: [float(value) for value in text.split(",")], default=None,
+                        help="comma separated initial populations (default: 1 each)")
+    parser.add_argument("--method", choices=METHODS, default="runge-kutta")
+    parser.add_argument("--time-step", type=float, default=0.05)
+    parser.add_argument("--start-time", type=float, default=0)
+    parser.add_argument("--final-time", type=float, default=50)
+    parser.add_argument("--axes", default="time,1,2", help="three of time, species names or numbers for the graph")
+    parser.add_argument("--output", default="-", help="CSV file to write, - for stdout, or graph")
+    args = parser.parse_args(argv)
+
+    if args.equation:
+        community = parse_community(dict(args.equation))
+    elif args.food_chain:
+        community = food_chain(args.food_chain)
+    else:
+        community = competition(args.competition)
+    initial = np.ones(len(community)) if args.initial is None else args.initial
+    simulation = METHODS[args.method](community, initial, args.time_step, args.start_time, args.final_time)
+
+    if args.output == "graph":
+        from visual import draw_graph
+
+        data, labels = select_axes(simulation.calculate_points(), community, args.axes.split(","))
+        draw_graph(data, labels)
+        return
+
+    header = ",".join(("time",) + community.names)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        output.write(header + "\n")
+        for chunk in simulation.iter_chunks():
+            np.savetxt(output, chunk, fmt="%.10g", delimiter=",")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import re
+from functools import lru_cache
+
+# Coefficients are written like "3", "3.", ".5" or "1e-05" (the form repr() gives); only a lowercase e followed by
+# digits is an exponent, since an uppercase E is a variable as in "3E - 1.4EF"
+_TERM_PATTERN = re.compile(
+    r'([+-]*)(?:((?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?)\*?)?((?:[A-Z](?:(?:\^|\*\*)\d+)?(?:\*(?=[A-Z]))?)*)')
+_FACTOR_PATTERN = re.compile(r'([A-Z])(?:(?:\^|\*\*)(\d+))?')
+# Larger powers overflow a float for any population above 2 and only come from typing mistakes
+MAX_POWER = 100
+
+
+def parse_terms(equation):
+    # Splits a polynomial such as "3R - 0.1R^2 - 1.4RF + 2" into (coefficient, ((letter, power), ...)) terms,
+    # keeping the letters in the order they were written
+    text = equation.replace(" ", "")
+    if not text:
+        raise ValueError("Equation is empty.")
+
+    terms = []
+    position = 0
+    while position < len(text):
+        match = _TERM_PATTERN.match(text, position)
+        signs, number, letters = match.groups()
+        if match.end() == position or (terms and not signs) or (number is None and not letters):
+            raise ValueError(f"Could not parse the equation near '{text[position:]}'.")
+
+        coefficient = float(number) if number is not None else 1.0
+        if signs.count("-") % 2:
+            coefficient = -coefficient
+
+        powers = {}
+        for letter, power in _FACTOR_PATTERN.findall(letters):
+            powers[letter] = powers.get(letter, 0) + (int(power) if power else 1)
+            if powers[letter] > MAX_POWER:
+                raise ValueError(f"Power of {letter} is above {MAX_POWER} near '{text[position:]}'.")
+        terms.append((coefficient, tuple((letter, power) for letter, power in powers.items() if power)))
+        position = match.end()
+
+    return terms
+
+
+def find_letters(terms):
+    # The interaction term decides which letter is the prey and which the predator, as in "-1.4RF"
+    for _, factors in terms:
+        if len(factors) == 2 and all(power == 1 for _, power in factors):
+            return factors[0][0], factors[1][0]
+    raise ValueError("Invalid equation format. Ensure it contains prey and predator terms.")
+
+
+def linear_coefficients(terms, letter, prey_letter, predator_letter):
+    # Growth rate of `letter` and the prey-predator interaction rate, the two numbers the Prey/Predator classes keep
+    growth_rate = 0
+    control_rate = 0
+    for coefficient, factors in terms:
+        if factors == ((letter, 1),):
+            growth_rate += coefficient
+        elif dict(factors) == {prey_letter: 1, predator_letter: 1}:
+            control_rate += coefficient
+    return growth_rate, control_rate
+
+
+def standard_equation(growth_rate, control_rate, letter, prey_letter, predator_letter):
+    return f"{float(growth_rate)!r}{letter} + {float(control_rate)!r}{prey_letter}{predator_letter}"
+
+
+# Bounded because the server and the explorer compile whatever strings they are sent for as long as they run
+@lru_cache(maxsize=256)
+def compile_equation(equation, prey_letter, predator_letter):
+    # Generates a plain Python function once per equation string; it works on floats and NumPy arrays alike
+    names = {prey_letter: "prey", predator_letter: "predator"}
+    merged = {}
+    for coefficient, factors in parse_terms(equation):
+        for letter, _ in factors:
+            if letter not in names:
+                raise ValueError(f"Unknown variable '{letter}'. Use only '{prey_letter}' and '{predator_letter}'.")
+        merged[factors] = merged.get(factors, 0) + coefficient
+
+    parts = []
+    for factors, coefficient in merged.items():
+        product = [repr(coefficient)]
+        for letter, power in factors:
+            product.append(names[letter] if power == 1 else f"{names[letter]}**{power}")
+        parts.append("*".join(product))
+
+    source = f"def rhs(prey, predator):\n    return {' + '.join(parts) or '0.0'}\n"
+    namespace = {}
+    exec(compile(source, f"<equation {equation}>", "exec"), namespace)
+    rhs = namespace["rhs"]
+    rhs.source = source
+    return rhs
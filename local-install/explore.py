@@ -0,0 +1,189 @@
+import queue
+import threading
+
+import numpy as np
+import vispy.app
+import vispy.scene
+from vispy import gloo
+from vispy.scene import visuals
+
+from render import camera_pose
+from simulation import Euler, Predator, Prey, RungeKutta, Symplectic, is_standard
+from visual import SharedLine, _add_axes, _set_camera_from_position_and_target, _update_axes
+
+PARAMETERS = ("prey_growth_rate", "prey_control_rate", "predator_growth_rate", "predator_control_rate",
+              "initial_prey_population", "initial_predator_population")
+METHODS = {"euler": Euler, "runge-kutta": RungeKutta, "symplectic": Symplectic}
+
+# Seconds without a key press before the latest values are recomputed, so holding a key runs one job, not dozens
+DEBOUNCE = 0.12
+# Rows integrated between checks for a newer job; a stale job stops within one chunk
+_CHUNK_ROWS = 4096
+
+_HELP = "Left/Right: pick   Up/Down: change (Shift: x10)   Backspace: reset camera   R: reset values"
+
+
+class Explorer:
+    # Keyboard-driven parameter exploration. Integration runs on a worker thread; each change bumps a generation
+    # number, and the worker drops any job whose generation is no longer current, even halfway through a run.
+    # Finished runs are written into the existing vertex buffer, so no visual is rebuilt while values change.
+    def __init__(self, values, time_step=0.01, start_time=0, final_time=50, method="runge-kutta",
+                 letters=("R", "F"), order=2, show=True):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}'. Choose from: {', '.join(METHODS)}")
+        self.initial_values = {name: float(values[name]) for name in PARAMETERS}
+        self.values = dict(self.initial_values)
+        self.time_step = time_step
+        self.start_time = start_time
+        self.final_time = final_time
+        self.method = method
+        self.letters = letters
+        # Only the symplectic method takes an order
+        self.options = (order,) if method == "symplectic" else ()
+        self.selected = 0
+
+        self.generation = 0
+        self.shown_generation = -1
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+        self.canvas = vispy.scene.SceneCanvas(keys='interactive', show=show, bgcolor='black', size=(800, 600))
+        self.view = self.canvas.central_widget.add_view()
+        self.view.camera = vispy.scene.cameras.TurntableCamera(fov=75)
+
+        points = self._integrate(self.generation, self.values)
+        self.bounds = _bounds(points)
+        # Sized for the whole run up front; the horizon never changes, so every recompute fits the same buffer
+        self.buffer = gloo.VertexBuffer(points.astype(np.float32))
+        self.rows = len(points)
+        self.line = SharedLine(self.buffer, parent=self.view.scene)
+        self.axes = _add_axes(self.view, ("Time",) + tuple(letters))
+        _update_axes(self.axes, self.bounds)
+        _set_camera_from_position_and_target(self.view.camera, *camera_pose("Angler", self.bounds))
+
+        self.status = visuals.Text("", parent=self.view, pos=(10, 20), anchor_x='left', anchor_y='bottom',
+                                   color='white', font_size=9)
+        self.shown_generation = self.generation
+        self._show_status()
+
+        self._debounce = vispy.app.Timer(interval=DEBOUNCE, iterations=1, connect=self._submit, start=False)
+        self._poll = vispy.app.Timer(interval=1 / 30, connect=self._collect, start=True)
+        self.canvas.events.key_press.connect(self._on_key)
+
+    def _integrate(self, generation, values):
+        # Returns (rows, 3) points, or None when a newer job arrived before the run finished
+        prey = Prey(values["prey_growth_rate"], values["prey_control_rate"], *self.letters)
+        predator = Predator(values["predator_growth_rate"], values["predator_control_rate"], *self.letters)
+        simulation = METHODS[self.method](values["initial_prey_population"], values["initial_predator_population"],
+                                          prey, predator, self.time_step, self.start_time, self.final_time,
+                                          *self.options)
+        chunks = []
+        for chunk in simulation.iter_chunks(_CHUNK_ROWS):
+            if generation != self.generation:
+                return None
+            chunks.append(chunk)
+        return np.concatenate(chunks)
+
+    def _work(self):
+        while True:
+            generation, values = self._jobs.get()
+            # A job that was superseded while it waited is skipped without starting
+            if generation != self.generation:
+                continue
+            points = self._integrate(generation, values)
+            if points is not None:
+                self._results.put((generation, points))
+
+    def _submit(self, event=None):
+        self._jobs.put((self.generation, dict(self.values)))
+
+    def _collect(self, event=None):
+        # Keeps only the newest finished run; older ones that slipped through are dropped
+        latest = None
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] == self.generation:
+                latest = result
+        if latest is None:
+            return
+
+        generation, points = latest
+        self.shown_generation = generation
+        # The GPU gets float32, so anything past its range is as unusable as an overflow
+        if not (np.abs(points) < np.finfo(np.float32).max).all():
+            self._show_status("These values overflow; change them to continue.")
+            return
+        self.buffer.set_subdata(points.astype(np.float32))
+        self.bounds = _bounds(points)
+        _update_axes(self.axes, self.bounds)
+        self._show_status()
+        self.canvas.update()
+
+    def change(self, name, value):
+        self.values[name] = float(value)
+        self.generation += 1
+        self._show_status()
+        # Restarting the timer on every change is the debounce
+        self._debounce.stop()
+        self._debounce.start()
+
+    def _on_key(self, event):
+        if event.key is None:
+            return
+        name = PARAMETERS[self.selected]
+        if event.key.name in ("Left", "Right"):
+            self.selected = (self.selected + (1 if event.key.name == "Right" else -1)) % len(PARAMETERS)
+            self._show_status()
+        elif event.key.name in ("Up", "Down"):
+            # Steps are 5% of the starting value (or 0.05 for a zero), ten times that with Shift
+            step = 0.05 * (abs(self.initial_values[name]) or 1)
+            if "Shift" in [key.name for key in event.modifiers]:
+                step *= 10
+            value = self.values[name] + (step if event.key.name == "Up" else -step)
+            if name.startswith("initial"):
+                value = max(value, 0.0)
+            self.change(name, round(value, 10))
+        elif event.key.name == "R":
+            self.values = dict(self.initial_values)
+            self.change(name, self.values[name])
+
+    def _show_status(self, message=None):
+        prey_letter, predator_letter = self.letters
+        labels = (f"{prey_letter}' growth", f"{prey_letter}' interaction", f"{predator_letter}' growth",
+                  f"{predator_letter}' interaction", f"initial {prey_letter}", f"initial {predator_letter}")
+        fields = [("> " if i == self.selected else "  ") + f"{label}: {self.values[name]:.4g}"
+                  for i, (label, name) in enumerate(zip(labels, PARAMETERS))]
+        state = message or ("computing..." if self.shown_generation != self.generation else f"{self.rows} points")
+        self.status.text = "   ".join(fields) + "\n" + state + "   " + _HELP
+
+
+def _bounds(points):
+    return tuple(value for column in points.T for value in (column.min(), column.max()))
+
+
+def explore_simulation(simulation):
+    # Opens the explorer on a simulation's equations, start values and time span
+    for equation in (simulation.prey, simulation.predator):
+        if not is_standard(equation):
+            raise ValueError("Exploring only supports the standard growth + interaction form.")
+    method = {cls: name for name, cls in METHODS.items()}.get(type(simulation))
+    if method is None:
+        raise ValueError("Exploring supports the Euler, Runge-Kutta and symplectic methods.")
+    values = {
+        "prey_growth_rate": simulation.prey.growth_rate,
+        "prey_control_rate": simulation.prey.control_rate,
+        "predator_growth_rate": simulation.predator.growth_rate,
+        "predator_control_rate": simulation.predator.control_rate,
+        "initial_prey_population": simulation.prey_population,
+        "initial_predator_population": simulation.predator_population,
+    }
+    explorer = Explorer(values, simulation.time_step, simulation.start_time, simulation.final_time, method,
+                        (simulation.prey.prey_letter, simulation.prey.predator_letter),
+                        getattr(simulation, "order", 2))
+    vispy.app.run()
+    return explorer
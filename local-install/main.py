@@ -1,6 +1,23 @@
+import argparse
+import cProfile
+import pstats
+import shutil
+import sys
+
+import numpy as np
+
+import profiling
 from simulation import *
-from visual import *
-import re
+from equation import compile_equation, find_letters, linear_coefficients, parse_terms
+from storage import save_trajectory, simulation_metadata
+from cache import SimulationCache
+from scenario import DEFAULTS, METHODS, build_simulation, check_scenario, load_scenarios
+
+# vispy and its GL stack take longer to import than everything else together, so visual is only imported by the
+# outputs that open a window
+
+# Shared across main() calls so re-running a simulation to view it another way does not recompute it
+RESULT_CACHE = SimulationCache()
 
 def get_positive_float_input(prompt, allow_zero=False):
     while True:
@@ -13,45 +30,13 @@ def get_positive_float_input(prompt, allow_zero=False):
             print("Invalid input. Please enter a numerical value.")
 
 def parse_equation(equation):
-    term_pattern = r'([+-]?\d*\.?\d*)\s*([A-Z])?([A-Z])?'
-    terms = re.findall(term_pattern, equation.replace(" ", ""))
-
-    #print(terms)
-
-    growth_rate = 0
-    control_rate = 0
-    prey_letter = None
-    predator_letter = None
-
-    for coefficient, var1, var2 in terms:
-        # No stated numerical coefficient (-F or +R)
-        if coefficient in ["", "+"]:
-            coefficient = 1.0
-        elif coefficient == "-":
-            coefficient = -1.0
-        else:
-            coefficient = float(coefficient)
+    terms = parse_terms(equation)
+    prey_letter, predator_letter = find_letters(terms)
 
-        if var1 and not var2:
-            if prey_letter is None:
-                growth_rate = coefficient
-                prey_letter = var1
-            else:
-                predator_letter = var1
-
-        elif var1 and var2:
-            control_rate = coefficient
-            prey_letter = var1
-            predator_letter = var2
-
-    if not predator_letter and prey_letter:
-        predator_letter = prey_letter
-        prey_letter = None
-
-    if not prey_letter or not predator_letter:
-        raise ValueError("Invalid equation format. Ensure it contains prey and predator terms.")
-
-    #print(growth_rate, control_rate, prey_letter, predator_letter)
+    # The single-letter linear term decides whose growth rate this is
+    own_letter = next((factors[0][0] for _, factors in terms if len(factors) == 1 and factors[0][1] == 1),
+                      prey_letter)
+    growth_rate, control_rate = linear_coefficients(terms, own_letter, prey_letter, predator_letter)
 
     return growth_rate, control_rate, prey_letter, predator_letter
 
@@ -70,13 +55,17 @@ def set_up_prey_predator():
                       f"Expected '{prey_letter}' and '{predator_letter}', but got '{predator_prey_letter}' and '{predator_predator_letter}'.")
                 continue
 
+            # Compiling here reports unknown variables while the user can still retype the equation
+            compile_equation(prey_equation, prey_letter, predator_letter)
+            compile_equation(predator_equation, prey_letter, predator_letter)
+
             break
         except ValueError as e:
             print(f"Invalid input: {e}")
 
-    prey = Prey(prey_growth_rate, prey_control_rate, prey_letter, predator_letter)
+    prey = Prey(prey_growth_rate, prey_control_rate, prey_letter, predator_letter, prey_equation)
 
-    predator = Predator(predator_growth_rate, predator_control_rate, prey_letter, predator_letter)
+    predator = Predator(predator_growth_rate, predator_control_rate, prey_letter, predator_letter, predator_equation)
 
     return prey, predator
 
@@ -122,32 +111,141 @@ def set_up_runge_kutta(prey, predator):
 
     return rk
 
+def set_up_symplectic(prey, predator):
+    print("\nEnter parameters for the Equation:")
+
+    initial_prey_population = get_positive_float_input("Initial prey population: ")
+    initial_predator_population = get_positive_float_input("Initial predator population: ")
+    time_step = get_positive_float_input("Time step (e.g., 0.2; larger steps than Runge-Kutta stay on the cycle): ")
+    final_time = get_positive_float_input("Final time (must be greater than 0): ")
+
+    order = input("Order (2 or 4, default 2): ").strip()
+    while order not in ['', '2', '4']:
+        order = input("Please enter 2 or 4: ").strip()
+
+    sym = Symplectic(initial_prey_population, initial_predator_population, prey, predator, time_step, 0, final_time,
+                     int(order or 2))
+
+    return sym
+
+def set_up_dormand_prince(prey, predator):
+    print("\nEnter parameters for the Equation:")
+
+    initial_prey_population = get_positive_float_input("Initial prey population: ")
+    initial_predator_population = get_positive_float_input("Initial predator population: ")
+    tolerance = get_positive_float_input("Error tolerance (e.g., 1e-6): ")
+    final_time = get_positive_float_input("Final time (must be greater than 0): ")
+    output_step = get_positive_float_input("Output spacing (e.g., 0.05): ")
+
+    dp = DormandPrince(initial_prey_population, initial_predator_population, prey, predator, tolerance, 0,
+                       final_time, output_times(0, final_time, output_step))
+
+    return dp
+
 def main():
     prey, predator = set_up_prey_predator()
 
-    method_choice = input("\nChoose simulation method: (E)uler or (R)unge-Kutta? ").strip().upper()
-    while method_choice not in ['E', 'R']:
-        print("Invalid choice. Please enter E for Euler or R for Runge-Kutta.")
-        method_choice = input("Choose simulation method: (E)uler or (R)unge-Kutta? ").strip().upper()
+    method_choice = input("\nChoose simulation method: (E)uler, (R)unge-Kutta, (S)ymplectic or (A)daptive? ").strip().upper()
+    while method_choice not in ['E', 'R', 'S', 'A'] or (
+            method_choice == 'S' and not (is_standard(prey) and is_standard(predator))):
+        if method_choice == 'S':
+            print("The symplectic method only works with growth and interaction terms. Please choose another method.")
+        else:
+            print("Invalid choice. Please enter E for Euler, R for Runge-Kutta, S for Symplectic or A for Adaptive.")
+        method_choice = input("Choose simulation method: (E)uler, (R)unge-Kutta, (S)ymplectic or (A)daptive? ").strip().upper()
 
     if method_choice == 'E':
         simulation = set_up_euler(prey, predator)
-    else:
+    elif method_choice == 'R':
         simulation = set_up_runge_kutta(prey, predator)
+    elif method_choice == 'S':
+        simulation = set_up_symplectic(prey, predator)
+    else:
+        simulation = set_up_dormand_prince(prey, predator)
 
     print(f"\nSimulation Object: {simulation}")
 
-    display_choice = input("\nDisplay results as (T)able or (G)raph? ").strip().upper()
-    while display_choice not in ['T', 'G']:
-        print("Invalid choice. Please enter T for Table or G for Graph.")
-        display_choice = input("Display results as (T)able or (G)raph? ").strip().upper()
+    display_choice = input("\nDisplay results as (T)able, (G)raph, (L)ive graph, (E)xplore parameters or (S)ave to file? ").strip().upper()
+    while display_choice not in ['T', 'G', 'L', 'E', 'S']:
+        print("Invalid choice. Please enter T for Table, G for Graph, L for Live graph, E for Explore or S for Save.")
+        display_choice = input("Display results as (T)able, (G)raph, (L)ive graph, (E)xplore parameters or (S)ave to file? ").strip().upper()
 
     if display_choice == 'T':
-        table_data = simulation.calculate_table()
-        simulation.print_table(table_data)
+        # Each grid row takes two terminal lines; page only when someone is there to press Enter
+        page_size = max((shutil.get_terminal_size().lines - 2) // 2, 1) if sys.stdout.isatty() else None
+        write_output(simulation, "table", page_size=page_size)
+    elif display_choice == 'S':
+        path = input("File to save to (e.g., run.traj or run.csv): ").strip()
+        write_output(simulation, path)
+    elif display_choice == 'L':
+        write_output(simulation, "live")
+    elif display_choice == 'E':
+        try:
+            write_output(simulation, "explore")
+        except ValueError as e:
+            print(e)
     else:
-        points_data = simulation.calculate_points()
+        write_output(simulation, "graph")
+
+def _chunks(simulation):
+    # Fixed-step methods stream; the adaptive method hands over its whole result at once
+    return simulation.iter_chunks(table=True) if hasattr(simulation, "iter_chunks") else iter([simulation.calculate_table()])
+
+def write_output(simulation, output, head=None, tail=None, page_size=None):
+    # "table", "points", "graph", "linked", "live", "explore", or a file: .csv, .png (rendered headless) or anything else as a .traj file
+    if output in ("table", "points"):
+        with profiling.phase("integrate"):
+            results = RESULT_CACHE.get_table(simulation) if output == "table" else RESULT_CACHE.get_points(simulation)
+        show = Visualizer().print_table if output == "table" else Visualizer().print_points
+        show(results, head=head, tail=tail, page_size=page_size)
+    elif output == "graph":
+        from visual import draw_graph
+        with profiling.phase("integrate"):
+            points_data = RESULT_CACHE.get_points(simulation)
         draw_graph(points_data)
+    elif output == "linked":
+        from visual import draw_linked
+        with profiling.phase("integrate"):
+            points_data = RESULT_CACHE.get_points(simulation)
+        draw_linked(points_data)
+    elif output == "explore":
+        from explore import explore_simulation
+        explore_simulation(simulation)
+    elif output == "live":
+        from visual import draw_graph_live
+        draw_graph_live(simulation)
+    elif output.lower().endswith(".csv"):
+        with profiling.phase("integrate_and_save"):
+            Visualizer().write_chunks(_chunks(simulation), output)
+        print(f"Saved {output}")
+    elif output.lower().endswith(".png"):
+        from render import camera_pose, graph_bounds, render_frames, write_png
+        with profiling.phase("integrate"):
+            points_data = RESULT_CACHE.get_points(simulation)
+        data = np.asarray(points_data)[:, :3]
+        write_png(output, next(render_frames(data, [camera_pose("Angler", graph_bounds(data))], backend="numpy")))
+        print(f"Saved {output}")
+    else:
+        metadata = simulation_metadata(simulation)
+        # Streaming interleaves integration with writing, so both are timed together
+        with profiling.phase("integrate_and_save"):
+            rows = save_trajectory(output, _chunks(simulation), **metadata)
+        print(f"Saved {rows} rows to {output}")
+
+def run_scenarios(scenarios):
+    # Runs every scenario in this process, sharing the result cache; returns the number that failed
+    failures = 0
+    for scenario in scenarios:
+        if len(scenarios) > 1:
+            print(f"== {scenario['name']} ==")
+        try:
+            scenario = check_scenario(scenario)
+            simulation = build_simulation(scenario)
+            write_output(simulation, scenario["output"], scenario["head"], scenario["tail"])
+        except (ValueError, OSError) as e:
+            failures += 1
+            print(f"{scenario['name']}: {e}", file=sys.stderr)
+    return failures
 
 def main_test():
     prey = Prey(3, -1.4, "R", "F")
@@ -159,5 +257,63 @@ def main_test():
 
     print(euler)
 
+def run_profiled(function, path=None):
+    # Instrumentation summary plus a cProfile run; with a path the raw stats are saved for pstats or snakeviz
+    profiling.enable()
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function)
+    finally:
+        profiling.disable()
+        print("\n" + profiling.summary())
+        if path is None:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+        else:
+            profiler.dump_stats(path)
+            print(f"Profile written to {path}; inspect it with: python -m pstats {path}")
+
+def _scenario_arguments(parser):
+    parser.add_argument("--prey", dest="prey_equation", default=DEFAULTS["prey_equation"], help="prey equation")
+    parser.add_argument("--predator", dest="predator_equation", default=DEFAULTS["predator_equation"],
+                        help="predator equation")
+    parser.add_argument("--method", choices=METHODS, default=DEFAULTS["method"])
+    parser.add_argument("--initial-prey", dest="initial_prey_population", type=float,
+                        default=DEFAULTS["initial_prey_population"])
+    parser.add_argument("--initial-predator", dest="initial_predator_population", type=float,
+                        default=DEFAULTS["initial_predator_population"])
+    parser.add_argument("--time-step", type=float, default=DEFAULTS["time_step"],
+                        help="step size, or output spacing for the adaptive method")
+    parser.add_argument("--tolerance", type=float, default=DEFAULTS["tolerance"], help="adaptive method only")
+    parser.add_argument("--order", type=int, choices=(2, 4), default=DEFAULTS["order"], help="symplectic method only")
+    parser.add_argument("--start-time", type=float, default=DEFAULTS["start_time"])
+    parser.add_argument("--final-time", type=float, default=DEFAULTS["final_time"])
+    parser.add_argument("--output", default=DEFAULTS["output"],
+                        help="table, points, graph, linked, live, explore, or a .csv, .png or .traj file")
+    parser.add_argument("--head", type=int, help="only print the first HEAD rows of a table")
+    parser.add_argument("--tail", type=int, help="only print the last TAIL rows of a table")
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate prey-predator populations.")
+    parser.add_argument("--profile", action="store_true", help="run under the profiler and print its stats")
+    parser.add_argument("--profile-output", metavar="FILE", help="run under the profiler and save its stats to FILE")
+    commands = parser.add_subparsers(dest="command")
+    _scenario_arguments(commands.add_parser("run", help="run one simulation from command line options"))
+    batch = commands.add_parser("batch", help="run every scenario in a JSON or TOML file")
+    batch.add_argument("file")
+    commands.add_parser("interactive", help="ask for the equations and settings (the default)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        scenario = {name: getattr(args, name) for name in DEFAULTS if hasattr(args, name)}
+        task = lambda: run_scenarios([dict(DEFAULTS, name="run", **scenario)])
+    elif args.command == "batch":
+        task = lambda: run_scenarios(load_scenarios(args.file))
+    else:
+        task = main
+
+    if args.profile or args.profile_output:
+        return run_profiled(task, args.profile_output)
+    return task()
+
 if __name__ == '__main__':
-    main_test()
+    sys.exit(1 if cli() else 0)
@@ -0,0 +1,147 @@
+import argparse
+import gzip
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import Euler, Predator, Prey, RungeKutta
+from sweep import _parse_values
+
+# Grid axes in index order; the last TILE_AXES vary inside a tile, the rest pick the tile
+AXES = ("method", "prey_growth_rate", "prey_control_rate", "predator_growth_rate", "predator_control_rate",
+        "time_step", "final_time", "initial_prey_population", "initial_predator_population")
+TILE_AXES = 2
+METHODS = {"euler": Euler, "runge-kutta": RungeKutta}
+# Stored per row, after the implicit time column; the same columns the web table shows
+COLUMNS = ("prey", "d_prey", "predator", "d_predator")
+# The web front end refuses to plot more steps than this, so longer runs are not worth shipping
+MAX_STEPS = 10000
+FORMAT_VERSION = 1
+
+_LEVELS = np.iinfo(np.uint16).max
+
+
+def quantize(table):
+    # (rows, 4) columns -> per-column offset and scale as float32, and uint16 codes with value = offset + code * scale.
+    # A run that overflowed gets a NaN scale so the browser computes it itself.
+    values = np.asarray(table, dtype=float)
+    low = values.min(axis=0)
+    high = values.max(axis=0)
+    if not (np.isfinite(low).all() and np.isfinite(high).all()):
+        return (np.zeros(len(COLUMNS), np.float32), np.full(len(COLUMNS), np.nan, np.float32),
+                np.zeros(values.shape, np.uint16))
+
+    # Offsets and scales are rounded to float32 before coding, so the browser decodes with exactly these numbers
+    offset = low.astype(np.float32)
+    scale = ((high - offset) / _LEVELS).astype(np.float32)
+    codes = np.rint((values - offset) / np.where(scale > 0, scale, 1))
+    return offset, scale, np.clip(codes, 0, _LEVELS).astype(np.uint16)
+
+
+def _run_tile(task):
+    # One tile: every initial-population pair for one choice of the other axes. Layout: offsets (runs, 4) float32,
+    # scales (runs, 4) float32, then codes (runs, 4, steps) uint16, little-endian and gzip compressed. Each channel
+    # holds the difference from the previous code (wrapping at 2^16): smooth curves make small, repetitive
+    # differences that gzip shrinks far better than the codes themselves.
+    outer, inner, path = task
+    method, prey_growth_rate, prey_control_rate, predator_growth_rate, predator_control_rate, time_step, \
+        final_time = outer
+    prey = Prey(prey_growth_rate, prey_control_rate, "R", "F")
+    predator = Predator(predator_growth_rate, predator_control_rate, "R", "F")
+
+    offsets, scales, codes = [], [], []
+    for initial_prey_population, initial_predator_population in inner:
+        table = METHODS[method](initial_prey_population, initial_predator_population, prey, predator, time_step, 0,
+                                final_time).calculate_table()
+        offset, scale, code = quantize(np.asarray(table)[:, 1:])
+        offsets.append(offset)
+        scales.append(scale)
+        codes.append(np.diff(code.T, axis=1, prepend=np.uint16(0)))
+
+    payload = (np.array(offsets, dtype="<f4").tobytes() + np.array(scales, dtype="<f4").tobytes() +
+               np.array(codes, dtype="<u2").tobytes())
+    with open(path, "wb") as file:
+        file.write(gzip.compress(payload, compresslevel=9, mtime=0))
+    return codes[0].shape[1], os.path.getsize(path)
+
+
+def precompute(axes, output, workers=None):
+    # Writes output/index.json and output/tiles/*.bin.gz for the grid of `axes` (name -> list of values)
+    missing = [name for name in AXES if name not in axes]
+    if missing:
+        raise ValueError(f"Missing grid axes: {', '.join(missing)}")
+    unknown = [method for method in axes["method"] if method not in METHODS]
+    if unknown:
+        raise ValueError(f"Unknown method '{unknown[0]}'. Choose from: {', '.join(METHODS)}")
+    axes = {name: [str(value) if name == "method" else float(value) for value in axes[name]] for name in AXES}
+
+    for time_step, final_time in itertools.product(axes["time_step"], axes["final_time"]):
+        if time_step <= 0 or final_time <= 0 or final_time / time_step > MAX_STEPS:
+            raise ValueError(f"Time step {time_step:g} to {final_time:g} needs more than {MAX_STEPS} steps "
+                             "or is not positive.")
+
+    os.makedirs(os.path.join(output, "tiles"), exist_ok=True)
+    inner = list(itertools.product(*(axes[name] for name in AXES[-TILE_AXES:])))
+    tasks = [(outer, inner, os.path.join(output, "tiles", f"{number}.bin.gz"))
+             for number, outer in enumerate(itertools.product(*(axes[name] for name in AXES[:-TILE_AXES])))]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        written = [_run_tile(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = list(executor.map(_run_tile, tasks))
+
+    index = {
+        "version": FORMAT_VERSION,
+        "start_time": 0,
+        "columns": COLUMNS,
+        "axes": axes,
+        "tile_axes": AXES[-TILE_AXES:],
+        # Tile n is the n-th combination of the other axes, last axis fastest; steps is its row count
+        "tiles": [{"file": f"tiles/{number}.bin.gz", "steps": steps} for number, (steps, _) in enumerate(written)],
+    }
+    with open(os.path.join(output, "index.json"), "w") as file:
+        json.dump(index, file, separators=(",", ":"))
+    return len(tasks) * len(inner), sum(size for _, size in written)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute trajectories for the server-less web page.")
+    parser.add_argument("--output", default=os.path.join("..", "server-less", "static", "precomputed"),
+                        help="directory for index.json and tiles/ (default: the web page's precomputed folder)")
+    parser.add_argument("--config", help="JSON file mapping each axis to its list of values")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--method", default="euler,runge-kutta", help="comma separated methods")
+    # The web page's starting values, so its first Graph! press is served from a tile
+    defaults = {
+        "prey_growth_rate": "3",
+        "prey_control_rate": "-1.4",
+        "predator_growth_rate": "-1",
+        "predator_control_rate": "0.8",
+        "time_step": "0.05",
+        "final_time": "12",
+        "initial_prey_population": "0.5,1,1.5,2",
+        "initial_predator_population": "0.5,1,1.5,2",
+    }
+    for name in AXES[1:]:
+        parser.add_argument("--" + name.replace("_", "-"), default=defaults[name], metavar="VALUES",
+                            help="comma separated values or start:stop:count")
+    args = parser.parse_args(argv)
+
+    if args.config:
+        with open(args.config) as file:
+            axes = json.load(file)
+    else:
+        axes = {name: list(_parse_values(getattr(args, name))) for name in AXES[1:]}
+        axes["method"] = args.method.split(",")
+
+    runs, size = precompute(axes, args.output, args.workers)
+    print(f"Wrote {runs} trajectories ({size / 1024:.1f} KiB) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import contextlib
+import sys
+import time
+from collections import Counter
+
+# Off by default. Instrumented code checks this once per run or phase, never per step, and wraps nothing while it
+# is off, so the hot loops are unchanged unless profiling was switched on first.
+ENABLED = False
+
+_counts = Counter()
+_phases = {}
+_NOT_RECORDING = contextlib.nullcontext()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    _counts.clear()
+    _phases.clear()
+
+
+def count(name, amount=1):
+    if ENABLED:
+        _counts[name] += amount
+
+
+def counted(name, function):
+    # Returns `function` itself when profiling is off, so callers can bind the result into their inner loops
+    if not ENABLED:
+        return function
+
+    def wrapper(*args):
+        _counts[name] += 1
+        return function(*args)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def _record(name):
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        calls, seconds, allocated = _phases.get(name, (0, 0.0, 0))
+        _phases[name] = (calls + 1, seconds + elapsed, allocated + sys.getallocatedblocks() - blocks)
+
+
+def phase(name):
+    # Wall time and net allocated memory blocks of one stage: integrate, convert, tabulate, upload, ...
+    return _record(name) if ENABLED else _NOT_RECORDING
+
+
+def start_phase(name):
+    # For stages that begin and end in different callbacks, such as a canvas draw
+    if not ENABLED:
+        return None
+    recording = _record(name)
+    recording.__enter__()
+    return recording
+
+
+def end_phase(recording):
+    if recording is not None:
+        recording.__exit__(None, None, None)
+
+
+def summary():
+    lines = []
+    if _phases:
+        lines.append(f"{'phase':<24} {'calls':>8} {'seconds':>12} {'net blocks':>12}")
+        for name, (calls, seconds, allocated) in sorted(_phases.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<24} {calls:>8} {seconds:>12.6f} {allocated:>12}")
+    if _counts:
+        lines.append(f"{'counter':<36} {'count':>12}")
+        for name, value in sorted(_counts.items()):
+            lines.append(f"{name:<36} {value:>12}")
+    return "\n".join(lines) if lines else "No instrumentation recorded."
@@ -0,0 +1,291 @@
+import argparse
+import math
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from storage import load_trajectory
+
+VIEWS = ("Angler", "Fronter", "Sider", "Topper")
+# Matches the interactive canvas in visual.draw_graph
+DEFAULT_SIZE = (800, 600)
+FIELD_OF_VIEW = 75
+BACKGROUND = (0, 0, 0)
+LINE_COLOR = (255, 255, 255)
+AXIS_COLORS = ((255, 0, 0), (0, 255, 0), (0, 0, 255))
+
+# Segments rasterized per block, which bounds the memory of the sample arrays
+_SEGMENT_BLOCK = 65536
+
+
+def graph_bounds(data):
+    return tuple(float(value) for pair in zip(data.min(axis=0), data.max(axis=0)) for value in pair)
+
+
+def camera_pose(view_name, bounds):
+    # (position, target) of a preset view; unknown names get a distant perspective
+    x_min, x_max, y_min, y_max, z_min, z_max = bounds
+    max_time, max_prey, max_predator = x_max, y_max, z_max
+    mid_time, mid_prey, mid_predator = (x_min + x_max) / 2.0, (y_min + y_max) / 2.0, (z_min + z_max) / 2.0
+    target = (mid_time, mid_predator, -mid_prey)
+
+    if view_name == "Angler":
+        position = (-max_time, 1.2 * max_predator, 0.7 * max_prey)
+    elif view_name == "Fronter":
+        position = (2 * max_time, mid_predator, -mid_prey)
+    elif view_name == "Sider":
+        position = (mid_time, mid_predator, 2 * max_prey)
+    elif view_name == "Topper":
+        position = (mid_time, 3 * max_predator, -mid_prey)
+    else:
+        position = (2 * max_time, 2 * max_predator, -2 * max_prey)
+    return position, target
+
+
+def turntable_angles(position, target):
+    # (center, distance, azimuth, elevation) for a turntable camera placed at `position` looking at `target`
+    vx, vy, vz = (p - t for p, t in zip(position, target))
+    distance = math.sqrt(vx * vx + vy * vy + vz * vz)
+    azimuth = math.degrees(math.atan2(vz, vx))
+    elevation = math.degrees(math.asin(vy / distance))
+    return tuple(target), distance, azimuth, elevation
+
+
+def project(points, center, distance, azimuth, elevation, size, fov=FIELD_OF_VIEW):
+    # Pixel coordinates and depth of each point as vispy's z-up TurntableCamera would show them
+    azimuth = math.radians(azimuth)
+    elevation = math.radians(elevation)
+    back = np.array([math.cos(elevation) * math.sin(azimuth), -math.cos(elevation) * math.cos(azimuth),
+                     math.sin(elevation)])
+    up = np.array([-math.sin(elevation) * math.sin(azimuth), math.sin(elevation) * math.cos(azimuth),
+                   math.cos(elevation)])
+    right = np.cross(up, back)
+    eye = np.asarray(center, dtype=float) + distance * back
+
+    relative = np.asarray(points, dtype=float) - eye
+    depth = -(relative @ back)
+    scale = 1 / math.tan(math.radians(fov) / 2)
+    width, height = size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = scale * (relative @ right) / (depth * width / height)
+        y = scale * (relative @ up) / depth
+    return np.column_stack(((x + 1) / 2 * width, (1 - y) / 2 * height)), depth
+
+
+def _draw_polyline(image, pixels, depth, color):
+    # Samples every segment once per pixel of its length; segments with an end behind the camera are dropped
+    height, width = image.shape[:2]
+    for start in range(0, len(pixels) - 1, _SEGMENT_BLOCK):
+        stop = min(start + _SEGMENT_BLOCK, len(pixels) - 1)
+        begin = pixels[start:stop]
+        end = pixels[start + 1:stop + 1]
+        visible = (depth[start:stop] > 0) & (depth[start + 1:stop + 1] > 0)
+        begin = begin[visible]
+        end = end[visible]
+        if not len(begin):
+            continue
+
+        # Longer than the image diagonal means the segment mostly runs off screen; cap its samples there
+        length = np.minimum(np.ceil(np.abs(end - begin).max(axis=1)), width + height).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(begin)), length)
+        offsets = np.arange(len(segment)) - np.repeat(np.cumsum(length) - length, length)
+        fraction = offsets / np.maximum(length - 1, 1)[segment]
+        samples = begin[segment] + (end - begin)[segment] * fraction[:, None]
+
+        columns = np.floor(samples[:, 0]).astype(np.int64)
+        rows = np.floor(samples[:, 1]).astype(np.int64)
+        inside = (columns >= 0) & (columns < width) & (rows >= 0) & (rows < height)
+        image[rows[inside], columns[inside]] = color
+
+
+def _render_numpy(data, poses, size):
+    bounds = graph_bounds(data)
+    x_min, x_max, y_min, y_max, z_min, z_max = bounds
+    origin = (x_min, y_min, z_min)
+    axes = [np.array([origin, end]) for end in ((x_max, y_min, z_min), (x_min, y_max, z_min), (x_min, y_min, z_max))]
+
+    for pose in poses:
+        camera = turntable_angles(*pose)
+        image = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        image[:] = BACKGROUND
+        _draw_polyline(image, *project(data, *camera, size), LINE_COLOR)
+        # Axis lines without their text labels; there is no font rasterizer here
+        for axis, color in zip(axes, AXIS_COLORS):
+            _draw_polyline(image, *project(axis, *camera, size), color)
+        yield image
+
+
+def _render_vispy(data, poses, size):
+    # Offscreen canvas with the same scene as draw_graph; needs an OpenGL context (EGL or OSMesa when headless)
+    import vispy.scene
+    import visual
+    from vispy.scene import visuals
+
+    canvas = vispy.scene.SceneCanvas(show=False, bgcolor='black', size=size)
+    view = canvas.central_widget.add_view()
+    camera = vispy.scene.cameras.TurntableCamera(fov=FIELD_OF_VIEW)
+    view.camera = camera
+    vertices = data[visual.decimation_indices(data, visual.LOD_VERTICES_PER_PIXEL * size[0])].astype(np.float32)
+    view.add(visuals.Line(pos=vertices, color='white', width=1))
+
+    visual._set_bounds(*graph_bounds(data))
+    visual._update_axes(visual._add_axes(view))
+    try:
+        for pose in poses:
+            camera.center, camera.distance, camera.azimuth, camera.elevation = turntable_angles(*pose)
+            yield canvas.render(alpha=False)
+    finally:
+        canvas.close()
+
+
+def render_frames(data, poses, size=DEFAULT_SIZE, backend="auto"):
+    # Yields one RGB uint8 image per (position, target) pose. "auto" tries vispy and falls back to the NumPy
+    # rasterizer when no OpenGL context can be created.
+    data = np.asarray(data, dtype=float)[:, :3]
+    poses = list(poses)
+    if backend in ("auto", "vispy"):
+        try:
+            frames = _render_vispy(data, poses, size)
+            first = next(frames)
+        except Exception as error:
+            if backend == "vispy":
+                raise
+            print(f"vispy rendering unavailable ({error}); using the NumPy rasterizer", file=sys.stderr)
+        else:
+            yield first
+            yield from frames
+            return
+    elif backend != "numpy":
+        raise ValueError(f"Unknown render backend: {backend}")
+    yield from _render_numpy(data, poses, size)
+
+
+def orbit_poses(data, frames, view_name="Angler"):
+    # Turns the camera of a preset view once around the data's vertical axis
+    position, target = camera_pose(view_name, graph_bounds(np.asarray(data, dtype=float)[:, :3]))
+    offset = np.subtract(position, target)
+    for angle in np.linspace(0, 2 * math.pi, frames, endpoint=False):
+        cos, sin = math.cos(angle), math.sin(angle)
+        # The turntable's azimuth comes from the x/z plane of the pose, so rotate in that plane
+        rotated = (offset[0] * cos - offset[2] * sin, offset[1], offset[0] * sin + offset[2] * cos)
+        yield tuple(np.add(target, rotated)), target
+
+
+def _png_chunk(kind, payload):
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def _png_data(image):
+    # Filter type 0 on every scanline
+    rows = np.concatenate([np.zeros((image.shape[0], 1), dtype=np.uint8), image.reshape(image.shape[0], -1)], axis=1)
+    return zlib.compress(rows.tobytes(), 6)
+
+
+def _png_header(image):
+    height, width = image.shape[:2]
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+
+def write_png(path, image):
+    image = np.ascontiguousarray(image[..., :3], dtype=np.uint8)
+    with open(path, "wb") as file:
+        file.write(_png_header(image) + _png_chunk(b"IDAT", _png_data(image)) + _png_chunk(b"IEND", b""))
+
+
+def write_apng(path, images, frame_seconds=1 / 24):
+    # Animated PNG: a single file that browsers play and plain PNG viewers show as its first frame
+    images = [np.ascontiguousarray(image[..., :3], dtype=np.uint8) for image in images]
+    height, width = images[0].shape[:2]
+    delay = struct.pack(">HH", max(int(round(frame_seconds * 1000)), 1), 1000)
+    parts = [_png_header(images[0]), _png_chunk(b"acTL", struct.pack(">II", len(images), 0))]
+    sequence = 0
+    for index, image in enumerate(images):
+        parts.append(_png_chunk(b"fcTL", struct.pack(">IIIII", sequence, width, height, 0, 0) + delay + b"\x00\x00"))
+        sequence += 1
+        if index == 0:
+            parts.append(_png_chunk(b"IDAT", _png_data(image)))
+        else:
+            parts.append(_png_chunk(b"fdAT", struct.pack(">I", sequence) + _png_data(image)))
+            sequence += 1
+    parts.append(_png_chunk(b"IEND", b""))
+    with open(path, "wb") as file:
+        file.write(b"".join(parts))
+
+
+def _load(source):
+    if isinstance(source, (str, os.PathLike)):
+        return load_trajectory(source).points
+    return np.asarray(source, dtype=float)
+
+
+def render_views(source, directory, views=VIEWS, size=DEFAULT_SIZE, backend="auto", prefix=""):
+    # One PNG per preset view; returns the written paths
+    data = _load(source)[:, :3]
+    bounds = graph_bounds(data)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, image in zip(views, render_frames(data, [camera_pose(name, bounds) for name in views], size, backend)):
+        path = os.path.join(directory, f"{prefix}{name}.png")
+        write_png(path, image)
+        paths.append(path)
+    return paths
+
+
+def render_orbit(source, path, frames=72, view_name="Angler", size=DEFAULT_SIZE, backend="auto", frame_seconds=1 / 24):
+    # An animated PNG when `path` ends in .png, otherwise a directory of numbered PNG frames
+    data = _load(source)[:, :3]
+    images = render_frames(data, orbit_poses(data, frames, view_name), size, backend)
+    if path.lower().endswith(".png"):
+        write_apng(path, list(images), frame_seconds)
+        return [path]
+
+    os.makedirs(path, exist_ok=True)
+    paths = []
+    for index, image in enumerate(images):
+        paths.append(os.path.join(path, f"frame_{index:04d}.png"))
+        write_png(paths[-1], image)
+    return paths
+
+
+def _render_task(task):
+    source, directory, views, orbit, size, backend = task
+    prefix = os.path.splitext(os.path.basename(source))[0] + "_" if isinstance(source, str) else ""
+    paths = render_views(source, directory, views, size, backend, prefix)
+    if orbit:
+        paths += render_orbit(source, os.path.join(directory, prefix + "orbit.png"), orbit, views[0] if views else
+                              "Angler", size, backend)
+    return paths
+
+
+def render_many(sources, directory, views=VIEWS, orbit=0, size=DEFAULT_SIZE, backend="auto", workers=None):
+    # Renders every trajectory file in its own worker process; no display is needed with the NumPy backend
+    tasks = [(source, directory, tuple(views), orbit, size, backend) for source in sources]
+    if workers == 1 or len(tasks) <= 1:
+        return [path for task in tasks for path in _render_task(task)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [path for paths in executor.map(_render_task, tasks) for path in paths]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render saved trajectories to PNG images without a display.")
+    parser.add_argument("trajectories", nargs="+", help=".traj files written by storage.save_trajectory")
+    parser.add_argument("--output", default="renders", help="directory for the images")
+    parser.add_argument("--views", default=",".join(VIEWS), help="comma separated preset views")
+    parser.add_argument("--orbit", type=int, default=0, metavar="FRAMES", help="also write an animated orbit")
+    parser.add_argument("--size", default="x".join(map(str, DEFAULT_SIZE)), help="image size, e.g. 1280x720")
+    parser.add_argument("--backend", choices=("auto", "vispy", "numpy"), default="auto")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    size = tuple(int(value) for value in args.size.lower().split("x"))
+    views = [name for name in args.views.split(",") if name]
+    for path in render_many(args.trajectories, args.output, views, args.orbit, size, args.backend, args.workers):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+
+from equation import compile_equation, find_letters, linear_coefficients, parse_terms
+from simulation import DP_MAX_STEPS, DormandPrince, Euler, Predator, Prey, RungeKutta, Symplectic, output_times
+
+METHODS = {"euler": Euler, "runge-kutta": RungeKutta, "symplectic": Symplectic, "adaptive": DormandPrince}
+
+# Every key a scenario may set; anything left out takes these values
+DEFAULTS = {
+    "name": None,
+    "prey_equation": "3R - 1.4RF",
+    "predator_equation": "-F + 0.8RF",
+    "method": "euler",
+    "initial_prey_population": 1.0,
+    "initial_predator_population": 1.0,
+    # Integration step for the fixed-step methods, output spacing for the adaptive one
+    "time_step": 0.05,
+    "tolerance": 1e-6,
+    "order": 2,
+    "start_time": 0.0,
+    "final_time": 12.0,
+    # "table", "points", "graph", "linked", "live", "explore" or a file name ending in .csv, .traj or .png
+    "output": "table",
+    "head": None,
+    "tail": None,
+}
+
+
+def build_equations(prey_equation, predator_equation):
+    prey_terms = parse_terms(prey_equation)
+    prey_letter, predator_letter = find_letters(prey_terms)
+    # Compiling reports variables the predator equation uses that the prey equation does not
+    compile_equation(prey_equation, prey_letter, predator_letter)
+    compile_equation(predator_equation, prey_letter, predator_letter)
+
+    prey_growth_rate, prey_control_rate = linear_coefficients(prey_terms, prey_letter, prey_letter, predator_letter)
+    predator_growth_rate, predator_control_rate = linear_coefficients(parse_terms(predator_equation),
+                                                                      predator_letter, prey_letter, predator_letter)
+    prey = Prey(prey_growth_rate, prey_control_rate, prey_letter, predator_letter, prey_equation)
+    predator = Predator(predator_growth_rate, predator_control_rate, prey_letter, predator_letter, predator_equation)
+    return prey, predator
+
+
+_FLOAT_KEYS = ("initial_prey_population", "initial_predator_population", "time_step", "tolerance", "start_time",
+               "final_time")
+_INT_KEYS = ("order", "head", "tail")
+_STRING_KEYS = ("prey_equation", "predator_equation", "method", "output")
+
+
+def check_scenario(scenario):
+    # Fills in defaults and converts each value to the type the simulation expects, so a mistyped entry in a file
+    # fails with ValueError naming the key instead of a TypeError deep inside the run
+    unknown = sorted(set(scenario) - set(DEFAULTS))
+    if unknown:
+        raise ValueError(f"Unknown keys: {', '.join(unknown)}")
+    scenario = dict(DEFAULTS, **scenario)
+    for key in _FLOAT_KEYS:
+        try:
+            scenario[key] = float(scenario[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number, got {scenario[key]!r}.") from None
+    for key in _INT_KEYS:
+        # head and tail may be left out (None); bools are ints to Python but never meant as one here
+        value = scenario[key]
+        if value is None and key != "order":
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = math.nan
+        if isinstance(value, bool) or not number.is_integer():
+            raise ValueError(f"{key} must be a whole number, got {value!r}.")
+        scenario[key] = int(number)
+    for key in _STRING_KEYS:
+        if not isinstance(scenario[key], str):
+            raise ValueError(f"{key} must be a string, got {scenario[key]!r}.")
+    return scenario
+
+
+def build_simulation(scenario, max_steps=DP_MAX_STEPS):
+    # max_steps caps the attempted steps of an adaptive run; the fixed-step methods ignore it
+    scenario = check_scenario(scenario)
+    if scenario["method"] not in METHODS:
+        raise ValueError(f"Unknown method '{scenario['method']}'. Choose from: {', '.join(METHODS)}")
+    if scenario["final_time"] <= scenario["start_time"]:
+        raise ValueError("Final time must be greater than start time.")
+    # The same checks the interactive prompts make; written so NaN fails them too
+    if not scenario["time_step"] > 0:
+        raise ValueError("Time step must be a positive number.")
+    if not scenario["tolerance"] > 0:
+        raise ValueError("Tolerance must be a positive number.")
+    for name in ("initial_prey_population", "initial_predator_population"):
+        if not scenario[name] >= 0:
+            raise ValueError(f"{name.replace('_', ' ').capitalize()} must not be negative.")
+
+    prey, predator = build_equations(scenario["prey_equation"], scenario["predator_equation"])
+    arguments = (scenario["initial_prey_population"], scenario["initial_predator_population"], prey, predator)
+    start_time = scenario["start_time"]
+    final_time = scenario["final_time"]
+
+    if scenario["method"] == "adaptive":
+        return DormandPrince(*arguments, scenario["tolerance"], start_time, final_time,
+                             output_times(start_time, final_time, scenario["time_step"]), max_steps)
+    if scenario["method"] == "symplectic":
+        return Symplectic(*arguments, scenario["time_step"], start_time, final_time, scenario["order"])
+    return METHODS[scenario["method"]](*arguments, scenario["time_step"], start_time, final_time)
+
+
+def load_scenarios(path):
+    # A JSON or TOML file holding either a list of scenarios or {"defaults": {...}, "scenarios": [...]};
+    # TOML files use [defaults] and [[scenarios]] tables
+    if os.path.splitext(path)[1].lower() == ".toml":
+        import tomllib
+
+        with open(path, "rb") as file:
+            document = tomllib.load(file)
+    else:
+        with open(path) as file:
+            document = json.load(file)
+
+    if isinstance(document, list):
+        document = {"scenarios": document}
+    defaults = dict(DEFAULTS, **document.get("defaults", {}))
+
+    scenarios = []
+    # Values are checked per scenario when it runs (check_scenario), so one bad entry does not stop the others
+    for index, entry in enumerate(document.get("scenarios", [])):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Scenario {index + 1} must be a table of settings, got {entry!r}.")
+        scenario = dict(defaults, **entry)
+        if scenario["name"] is None:
+            scenario["name"] = f"scenario {index + 1}"
+        scenarios.append(scenario)
+    return scenarios
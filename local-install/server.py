@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field, model_validator
+
+from cache import SimulationCache
+import scenario
+from simulation import POINT_COLUMNS, TABLE_COLUMNS
+
+# Larger runs belong in the batch tools; this keeps one request from holding a worker for minutes
+MAX_ROWS = 5_000_000
+# The adaptive method's step count depends on the tolerance, not the time step, so it gets its own budget; a run
+# that needs more fails with 422 after a few seconds instead of holding a worker indefinitely
+MAX_ADAPTIVE_STEPS = 200_000
+
+
+class SimulationRequest(BaseModel):
+    prey_equation: str = "3R - 1.4RF"
+    predator_equation: str = "-F + 0.8RF"
+    method: Literal["euler", "runge-kutta", "adaptive", "symplectic"] = "euler"
+    initial_prey_population: float = Field(1, ge=0, allow_inf_nan=False)
+    initial_predator_population: float = Field(1, ge=0, allow_inf_nan=False)
+    # Integration step for the fixed-step methods, output spacing for the adaptive one
+    time_step: float = Field(0.05, gt=0, allow_inf_nan=False)
+    # Tighter tolerances only buy rounding noise at the price of far more steps
+    tolerance: float = Field(1e-6, ge=1e-12, allow_inf_nan=False)
+    order: Literal[2, 4] = 2
+    start_time: float = Field(0, allow_inf_nan=False)
+    final_time: float = Field(12, allow_inf_nan=False)
+    table: bool = True
+    precision: Literal["float32", "float64"] = "float32"
+
+    @model_validator(mode="after")
+    def check_times(self):
+        if self.final_time <= self.start_time:
+            raise ValueError("Final time must be greater than start time.")
+        # Two finite times can still be further apart than a float can hold
+        if not math.isfinite(self.final_time - self.start_time):
+            raise ValueError("The time span is too large.")
+        if math.ceil((self.final_time - self.start_time) / self.time_step) + 2 > MAX_ROWS:
+            raise ValueError(f"Too many time steps; at most {MAX_ROWS} rows can be returned.")
+        return self
+
+
+def build_simulation(request):
+    return scenario.build_simulation(request.model_dump(include=set(scenario.DEFAULTS)), MAX_ADAPTIVE_STEPS)
+
+
+# One cache per worker process; it lives as long as the pool does
+_worker_cache = SimulationCache()
+
+
+def run_simulation(request):
+    simulation = build_simulation(request)
+    results = _worker_cache.get_table(simulation) if request.table else _worker_cache.get_points(simulation)
+    return np.ascontiguousarray(results, dtype=np.dtype(request.precision).newbyteorder("<")).tobytes(), len(results)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.pool = ProcessPoolExecutor(max_workers=int(os.environ.get("SIMULATION_WORKERS", os.cpu_count() or 1)))
+    app.state.in_flight = {}
+    try:
+        yield
+    finally:
+        app.state.pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title="3D Visualizer simulation service", lifespan=lifespan)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request, error):
+    # The default handler echoes each bad input back, and a JSON Infinity or NaN cannot be written out again
+    finite = lambda value: value if math.isfinite(value) else str(value)
+    errors = jsonable_encoder(error.errors(), custom_encoder={float: finite})
+    return JSONResponse(status_code=422, content={"detail": errors})
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/simulate")
+async def simulate(request: SimulationRequest):
+    key = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+    in_flight = app.state.in_flight
+
+    # Identical requests that arrive while a run is in progress share its result instead of queueing another run
+    future = in_flight.get(key)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(app.state.pool, run_simulation, request)
+        in_flight[key] = future
+        future.add_done_callback(lambda _: in_flight.pop(key, None))
+
+    try:
+        content, rows = await asyncio.shield(future)
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+    columns = TABLE_COLUMNS if request.table else POINT_COLUMNS
+    return Response(content=content, media_type="application/octet-stream", headers={
+        "X-Rows": str(rows),
+        "X-Columns": ",".join(columns),
+        "X-Dtype": np.dtype(request.precision).newbyteorder("<").str,
+    })
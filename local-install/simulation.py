@@ -1,37 +1,196 @@
-from tabulate import tabulate
+import math
+import sys
+
+import numpy as np
+
+import profiling
+from equation import compile_equation, parse_terms, standard_equation
+
+TABLE_COLUMNS = ("time", "prey", "d_prey", "predator", "d_predator")
+POINT_COLUMNS = ("time", "prey", "predator")
+TABLE_HEADERS = ("Time", "Prey", "ΔPrey", "Predator", "ΔPredator")
+POINT_HEADERS = ("Time", "Prey", "Predator")
+
+# printf-style so a whole chunk is formatted by a single % operation instead of one f-string per value
+_TABLE_FORMATS = ("%.2f", "%.4f", "%.4f", "%.4f", "%.4f")
+_POINT_FORMATS = ("%.2f", "%.4f", "%.4f")
+_CSV_FORMAT = "%.10g"
+_PRINT_CHUNK_ROWS = 4096
+
+# Yoshida's weights for composing three second-order steps into a fourth-order one
+_YOSHIDA_OUTER = 1 / (2 - 2 ** (1 / 3))
+_YOSHIDA_INNER = -(2 ** (1 / 3)) * _YOSHIDA_OUTER
+
+# Dormand-Prince 5(4) tableau, error weights (5th minus 4th order) and dense output polynomial
+_DP_C = (0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1)
+_DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+_DP_E = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+_DP_P = np.array([
+    [1, -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799],
+    [0, -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072],
+    [0, 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632],
+    [0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+    [0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423],
+])
+
+# Default limit on attempted steps per run, so an unreachable tolerance fails instead of running for hours
+DP_MAX_STEPS = 1_000_000
+DP_MIN_TOLERANCE = 100 * sys.float_info.epsilon
+
+
+def _time_grid(start_time, final_time, time_step):
+    # Same times as repeating `time += time_step` while `time < final_time`; cumsum adds in the same order
+    if not time_step > 0:
+        # Zero divides by zero and a negative step never reaches final_time, doubling the buffer until memory runs out
+        raise ValueError("Time step must be a positive number.")
+    count = max(int(math.ceil((final_time - start_time) / time_step)), 0) + 2
+    while True:
+        increments = np.full(count, time_step, dtype=float)
+        increments[0] = start_time
+        times = np.cumsum(increments)
+        reached = np.flatnonzero(times >= final_time)
+        if len(reached):
+            return times[:reached[0] + 1]
+        count *= 2
+
+
+def output_times(start_time, final_time, spacing):
+    # Evenly spaced output times for the adaptive method, ending exactly at final_time. arange can leave a point a
+    # rounding error short of (or past) final_time, which would repeat it, so such a point is dropped.
+    times = np.arange(start_time, final_time, spacing)
+    return np.append(times[final_time - times > 1e-9 * spacing], final_time)
+
+
+def _flat_view(results):
+    # Flat float64 view of a C-contiguous result buffer; scalar writes through it skip NumPy's per-row indexing
+    return memoryview(results).cast("B").cast("d")
+
+
+def _clamp(values):
+    # Matches max(0, value) element-wise, including NaN becoming 0
+    return np.where(values > 0, values, 0.0)
+
+
+def _iter_chunks(simulation, chunk_size, table, resume_from):
+    # Shared streaming loop for the fixed-step integrators; each chunk is a fresh array so consumers may keep it
+    width = len(TABLE_COLUMNS) if table else len(POINT_COLUMNS)
+    time_step = simulation.time_step
+    final_time = simulation.final_time
+    step = simulation._make_step()
+
+    chunk = np.empty((chunk_size, width))
+    rows = _flat_view(chunk)
+
+    if resume_from is None:
+        first_row, prey_population, predator_population = simulation._first_row(table)
+        time = simulation.start_time
+        rows[0:width] = np.array(first_row, dtype=float)
+        filled = 1
+    else:
+        # Every row holds the state the next step starts from, so a run can pick up after any row it produced
+        time = float(resume_from[0])
+        prey_population = float(resume_from[1])
+        predator_population = float(resume_from[3 if table else 2])
+        filled = 0
+
+    while time < final_time:
+        if filled == chunk_size:
+            simulation.prey_population = prey_population
+            simulation.predator_population = predator_population
+            yield chunk
+            chunk = np.empty((chunk_size, width))
+            rows = _flat_view(chunk)
+            filled = 0
+
+        prey_population, d_prey, predator_population, d_predator = step(prey_population, predator_population)
+        time += time_step
+
+        i = filled * width
+        rows[i] = time
+        if table:
+            rows[i + 1] = prey_population
+            rows[i + 2] = d_prey
+            rows[i + 3] = predator_population
+            rows[i + 4] = d_predator
+        else:
+            rows[i + 1] = prey_population
+            rows[i + 2] = predator_population
+        filled += 1
+
+    simulation.prey_population = prey_population
+    simulation.predator_population = predator_population
+    yield chunk[:filled]
+
 
 class Prey:
-    def __init__(self, growth_rate, control_rate, prey_letter, predator_letter):
+    def __init__(self, growth_rate, control_rate, prey_letter, predator_letter, equation=None):
         self.growth_rate = growth_rate
         self.control_rate = control_rate
         self.prey_letter = prey_letter
         self.predator_letter = predator_letter
+        self.equation = equation
+        self.rhs = _compile_rhs(equation, growth_rate, control_rate, prey_letter, prey_letter, predator_letter)
 
     def change_in_prey(self, prey_population, predator_population):
-        v = self.growth_rate * prey_population + self.control_rate * prey_population * predator_population
-        # print("temp prey", v)
-        return v
+        return self.rhs(prey_population, predator_population)
 
     def __str__(self):
+        if self.equation is not None:
+            return f"Prey equation: {self.equation}"
         return f"Prey equation: {self.growth_rate}{self.prey_letter} + {self.control_rate}{self.prey_letter}{self.predator_letter}"
 
 
 class Predator:
-    def __init__(self, growth_rate, control_rate, prey_letter, predator_letter):
+    def __init__(self, growth_rate, control_rate, prey_letter, predator_letter, equation=None):
         self.growth_rate = growth_rate
         self.control_rate = control_rate
         self.prey_letter = prey_letter
         self.predator_letter = predator_letter
+        self.equation = equation
+        self.rhs = _compile_rhs(equation, growth_rate, control_rate, predator_letter, prey_letter, predator_letter)
 
     def change_in_predator(self, prey_population, predator_population):
-        v = self.growth_rate * predator_population + self.control_rate * prey_population * predator_population
-        # print("temp predator", v)
-        return v
+        return self.rhs(prey_population, predator_population)
 
     def __str__(self):
+        if self.equation is not None:
+            return f"Predator equation: {self.equation}"
         return f"Predator equation: {self.growth_rate}{self.predator_letter} + {self.control_rate}{self.prey_letter}{self.predator_letter}"
 
 
+def is_standard(equation):
+    # True when the equation only has the growth term and the prey-predator interaction term
+    if equation.equation is None:
+        return True
+    own = equation.prey_letter if isinstance(equation, Prey) else equation.predator_letter
+    allowed = ({own: 1}, {equation.prey_letter: 1, equation.predator_letter: 1})
+    return all(dict(factors) in allowed for _, factors in parse_terms(equation.equation))
+
+
+def _compile_rhs(equation, growth_rate, control_rate, letter, prey_letter, predator_letter):
+    if equation is not None:
+        return compile_equation(equation, prey_letter, predator_letter)
+
+    if np.ndim(growth_rate) or np.ndim(control_rate):
+        # Per-trajectory coefficient arrays (batch runs) cannot be baked into generated code
+        if letter == prey_letter:
+            return lambda prey, predator: growth_rate * prey + control_rate * prey * predator
+        return lambda prey, predator: growth_rate * predator + control_rate * prey * predator
+
+    return compile_equation(standard_equation(growth_rate, control_rate, letter, prey_letter, predator_letter),
+                            prey_letter, predator_letter)
+
+
 class Euler:
     def __init__(self, initial_prey_population, initial_predator_population, prey, predator, time_step, start_time,
                  final_time):
@@ -52,49 +211,78 @@ class Euler:
             f"{self.predator}"
         )
 
-    def calculate_table(self):
-        time = self.start_time
-        d_prey = self.prey.change_in_prey(self.prey_population, self.predator_population)
-        d_predator = self.predator.change_in_predator(self.prey_population,
-                                                      self.predator_population)
-        results = [(time, self.prey_population, d_prey, self.predator_population, d_predator)]
-
-        self.prey_population = max(0, self.prey_population + (d_prey * self.time_step))
-        self.predator_population = max(0, self.predator_population + (d_predator * self.time_step))
+    def _make_step(self):
+        # Binds the compiled right-hand sides and step size once per run instead of looking them up every step
+        name = type(self).__name__
+        prey_rhs = profiling.counted(name + ".prey_rhs", self.prey.rhs)
+        predator_rhs = profiling.counted(name + ".predator_rhs", self.predator.rhs)
+        time_step = self.time_step
 
-        while time < self.final_time:
-            d_prey = self.prey.change_in_prey(self.prey_population, self.predator_population)
-            d_predator = self.predator.change_in_predator(self.prey_population,
-                                                          self.predator_population)
-            self.prey_population = max(0, self.prey_population + (d_prey * self.time_step))
-            self.predator_population = max(0, self.predator_population + (d_predator * self.time_step))
-            time += self.time_step
+        def step(prey_population, predator_population):
+            d_prey = prey_rhs(prey_population, predator_population)
+            d_predator = predator_rhs(prey_population, predator_population)
+            return (max(0, prey_population + (d_prey * time_step)), d_prey,
+                    max(0, predator_population + (d_predator * time_step)), d_predator)
 
-            results.append((time, self.prey_population, d_prey, self.predator_population, d_predator))
+        return step
 
+    def calculate_table(self):
+        times = _time_grid(self.start_time, self.final_time, self.time_step)
+        results = np.empty((len(times), len(TABLE_COLUMNS)))
+        results[:, 0] = times
+        rows = _flat_view(results)
+        step = self._make_step()
+
+        prey_population, d_prey, predator_population, d_predator = step(self.prey_population,
+                                                                              self.predator_population)
+        rows[1:5] = np.array((self.prey_population, d_prey, self.predator_population, d_predator))
+
+        for i in range(5, len(rows), 5):
+            prey_population, d_prey, predator_population, d_predator = step(prey_population, predator_population)
+            rows[i + 1] = prey_population
+            rows[i + 2] = d_prey
+            rows[i + 3] = predator_population
+            rows[i + 4] = d_predator
+
+        self.prey_population = prey_population
+        self.predator_population = predator_population
         return results
 
     def calculate_points(self):
-        time = self.start_time
-        d_prey = self.prey.change_in_prey(self.prey_population, self.predator_population)
-        d_predator = self.predator.change_in_predator(self.prey_population,
-                                                      self.predator_population)
-        results = [(time, self.prey_population, self.predator_population)]
-
-        self.prey_population = max(0, self.prey_population + (d_prey * self.time_step))
-        self.predator_population = max(0, self.predator_population + (d_predator * self.time_step))
+        times = _time_grid(self.start_time, self.final_time, self.time_step)
+        results = np.empty((len(times), len(POINT_COLUMNS)))
+        results[:, 0] = times
+        rows = _flat_view(results)
+        rows[1] = self.prey_population
+        rows[2] = self.predator_population
+        step = self._make_step()
+
+        prey_population, _, predator_population, _ = step(self.prey_population, self.predator_population)
+
+        for i in range(3, len(rows), 3):
+            prey_population, _, predator_population, _ = step(prey_population, predator_population)
+            rows[i + 1] = prey_population
+            rows[i + 2] = predator_population
+
+        self.prey_population = prey_population
+        self.predator_population = predator_population
+        return results
 
-        while time < self.final_time:
-            d_prey = self.prey.change_in_prey(self.prey_population, self.predator_population)
-            d_predator = self.predator.change_in_predator(self.prey_population,
-                                                          self.predator_population)
-            self.prey_population = max(0, self.prey_population + (d_prey * self.time_step))
-            self.predator_population = max(0, self.predator_population + (d_predator * self.time_step))
-            time += self.time_step
+    def _first_row(self, table):
+        prey_population, d_prey, predator_population, d_predator = self._make_step()(self.prey_population,
+                                                                                     self.predator_population)
+        if table:
+            first_row = (self.start_time, self.prey_population, d_prey, self.predator_population, d_predator)
+        else:
+            first_row = (self.start_time, self.prey_population, self.predator_population)
+        return first_row, prey_population, predator_population
 
-            results.append((time, self.prey_population, self.predator_population))
+    def iter_chunks(self, chunk_size=4096, table=False, resume_from=None):
+        return _iter_chunks(self, chunk_size, table, resume_from)
 
-        return results
+    def iter_points(self, table=False):
+        for chunk in self.iter_chunks(table=table):
+            yield from chunk.tolist()
 
 
 class RungeKutta:
@@ -117,109 +305,626 @@ class RungeKutta:
             f"{self.predator}"
         )
 
-    def calculate_table(self):
+    def _make_step(self):
+        # Binds the compiled right-hand sides and step size once per run instead of looking them up every step
+        name = type(self).__name__
+        change_in_prey = profiling.counted(name + ".prey_rhs", self.prey.rhs)
+        change_in_predator = profiling.counted(name + ".predator_rhs", self.predator.rhs)
         h = self.time_step
-        time = self.start_time
-        results = []
 
-        current_prey = self.prey_population
-        current_pred = self.predator_population
+        def step(current_prey, current_pred):
+            k1_prey = change_in_prey(current_prey, current_pred)
+            k1_pred = change_in_predator(current_prey, current_pred)
 
-        k1_prey = self.prey.change_in_prey(current_prey, current_pred)
-        k1_pred = self.predator.change_in_predator(current_prey, current_pred)
-        k2_prey = self.prey.change_in_prey(current_prey + 0.5 * h * k1_prey, current_pred + 0.5 * h * k1_pred)
-        k2_pred = self.predator.change_in_predator(current_prey + 0.5 * h * k1_prey, current_pred + 0.5 * h * k1_pred)
-        k3_prey = self.prey.change_in_prey(current_prey + 0.5 * h * k2_prey, current_pred + 0.5 * h * k2_pred)
-        k3_pred = self.predator.change_in_predator(current_prey + 0.5 * h * k2_prey, current_pred + 0.5 * h * k2_pred)
-        k4_prey = self.prey.change_in_prey(current_prey + h * k3_prey, current_pred + h * k3_pred)
-        k4_pred = self.predator.change_in_predator(current_prey + h * k3_prey, current_pred + h * k3_pred)
+            k2_prey = change_in_prey(current_prey + 0.5 * h * k1_prey, current_pred + 0.5 * h * k1_pred)
+            k2_pred = change_in_predator(current_prey + 0.5 * h * k1_prey, current_pred + 0.5 * h * k1_pred)
 
-        delta_prey = (k1_prey + 2 * k2_prey + 2 * k3_prey + k4_prey) / 6
-        delta_pred = (k1_pred + 2 * k2_pred + 2 * k3_pred + k4_pred) / 6
+            k3_prey = change_in_prey(current_prey + 0.5 * h * k2_prey, current_pred + 0.5 * h * k2_pred)
+            k3_pred = change_in_predator(current_prey + 0.5 * h * k2_prey, current_pred + 0.5 * h * k2_pred)
 
-        results.append((time, current_prey, delta_prey, current_pred, delta_pred))
+            k4_prey = change_in_prey(current_prey + h * k3_prey, current_pred + h * k3_pred)
+            k4_pred = change_in_predator(current_prey + h * k3_prey, current_pred + h * k3_pred)
 
-        while time < self.final_time:
-            k1_prey = self.prey.change_in_prey(current_prey, current_pred)
-            k1_pred = self.predator.change_in_predator(current_prey, current_pred)
+            delta_prey = (k1_prey + 2 * k2_prey + 2 * k3_prey + k4_prey) / 6
+            delta_pred = (k1_pred + 2 * k2_pred + 2 * k3_pred + k4_pred) / 6
 
-            k2_prey = self.prey.change_in_prey(current_prey + 0.5 * h * k1_prey, current_pred + 0.5 * h * k1_pred)
-            k2_pred = self.predator.change_in_predator(current_prey + 0.5 * h * k1_prey,
-                                                       current_pred + 0.5 * h * k1_pred)
+            # Update populations using the weighted average slope
+            return (max(0, current_prey + h * delta_prey), delta_prey,
+                    max(0, current_pred + h * delta_pred), delta_pred)
 
-            k3_prey = self.prey.change_in_prey(current_prey + 0.5 * h * k2_prey, current_pred + 0.5 * h * k2_pred)
-            k3_pred = self.predator.change_in_predator(current_prey + 0.5 * h * k2_prey,
-                                                       current_pred + 0.5 * h * k2_pred)
+        return step
 
-            k4_prey = self.prey.change_in_prey(current_prey + h * k3_prey, current_pred + h * k3_pred)
-            k4_pred = self.predator.change_in_predator(current_prey + h * k3_prey, current_pred + h * k3_pred)
+    def calculate_table(self):
+        times = _time_grid(self.start_time, self.final_time, self.time_step)
+        results = np.empty((len(times), len(TABLE_COLUMNS)))
+        results[:, 0] = times
+        rows = _flat_view(results)
 
-            delta_prey = (k1_prey + 2 * k2_prey + 2 * k3_prey + k4_prey) / 6
-            delta_pred = (k1_pred + 2 * k2_pred + 2 * k3_pred + k4_pred) / 6
+        current_prey = self.prey_population
+        current_pred = self.predator_population
+        step = self._make_step()
 
-            # Update populations using the weighted average slope
-            current_prey = max(0, current_prey + h * delta_prey)
-            current_pred = max(0, current_pred + h * delta_pred)
-            time += h
+        _, delta_prey, _, delta_pred = step(current_prey, current_pred)
+        rows[1:5] = np.array((current_prey, delta_prey, current_pred, delta_pred))
 
-            results.append((time, current_prey, delta_prey, current_pred, delta_pred))
+        for i in range(5, len(rows), 5):
+            current_prey, delta_prey, current_pred, delta_pred = step(current_prey, current_pred)
+            rows[i + 1] = current_prey
+            rows[i + 2] = delta_prey
+            rows[i + 3] = current_pred
+            rows[i + 4] = delta_pred
 
         self.prey_population = current_prey
         self.predator_population = current_pred
         return results
 
     def calculate_points(self):
-        h = self.time_step
-        time = self.start_time
-        results = []
+        times = _time_grid(self.start_time, self.final_time, self.time_step)
+        results = np.empty((len(times), len(POINT_COLUMNS)))
+        results[:, 0] = times
+        rows = _flat_view(results)
 
         current_prey = self.prey_population
         current_pred = self.predator_population
+        rows[1] = current_prey
+        rows[2] = current_pred
+        step = self._make_step()
 
-        results.append((time, current_prey, current_pred))
+        for i in range(3, len(rows), 3):
+            current_prey, _, current_pred, _ = step(current_prey, current_pred)
+            rows[i + 1] = current_prey
+            rows[i + 2] = current_pred
 
-        while time < self.final_time:
-            k1_prey = self.prey.change_in_prey(current_prey, current_pred)
-            k1_pred = self.predator.change_in_predator(current_prey, current_pred)
+        self.prey_population = current_prey
+        self.predator_population = current_pred
+        return results
 
-            k2_prey = self.prey.change_in_prey(current_prey + 0.5 * h * k1_prey, current_pred + 0.5 * h * k1_pred)
-            k2_pred = self.predator.change_in_predator(current_prey + 0.5 * h * k1_prey,
-                                                       current_pred + 0.5 * h * k1_pred)
+    def _first_row(self, table):
+        if table:
+            _, delta_prey, _, delta_pred = self._make_step()(self.prey_population, self.predator_population)
+            first_row = (self.start_time, self.prey_population, delta_prey, self.predator_population, delta_pred)
+        else:
+            first_row = (self.start_time, self.prey_population, self.predator_population)
+        return first_row, self.prey_population, self.predator_population
 
-            k3_prey = self.prey.change_in_prey(current_prey + 0.5 * h * k2_prey, current_pred + 0.5 * h * k2_pred)
-            k3_pred = self.predator.change_in_predator(current_prey + 0.5 * h * k2_prey,
-                                                       current_pred + 0.5 * h * k2_pred)
+    def iter_chunks(self, chunk_size=4096, table=False, resume_from=None):
+        return _iter_chunks(self, chunk_size, table, resume_from)
 
-            k4_prey = self.prey.change_in_prey(current_prey + h * k3_prey, current_pred + h * k3_pred)
-            k4_pred = self.predator.change_in_predator(current_prey + h * k3_prey, current_pred + h * k3_pred)
+    def iter_points(self, table=False):
+        for chunk in self.iter_chunks(table=table):
+            yield from chunk.tolist()
 
-            delta_prey = (k1_prey + 2 * k2_prey + 2 * k3_prey + k4_prey) / 6
-            delta_pred = (k1_pred + 2 * k2_pred + 2 * k3_pred + k4_pred) / 6
 
-            current_prey = max(0, current_prey + h * delta_prey)
-            current_pred = max(0, current_pred + h * delta_pred)
+class Symplectic:
+    # Strang splitting in log coordinates: ln R' depends only on F and ln F' only on R, so each half is solved
+    # exactly. The discrete map keeps a modified Lotka-Volterra invariant, so cycles neither spiral in nor out over
+    # long horizons. Written with exp() on the populations, which also keeps a population of zero at zero.
+    def __init__(self, initial_prey_population, initial_predator_population, prey, predator, time_step, start_time,
+                 final_time, order=2):
+        if not (is_standard(prey) and is_standard(predator)):
+            raise ValueError("The symplectic method only applies to the standard growth + interaction form.")
+        if order not in (2, 4):
+            raise ValueError("The symplectic method has orders 2 and 4.")
+        self.prey_population = initial_prey_population
+        self.predator_population = initial_predator_population
+        self.prey = prey
+        self.predator = predator
+        self.time_step = time_step
+        self.start_time = start_time
+        self.final_time = final_time
+        self.order = order
+
+    def __str__(self):
+        return (
+            f"Initial prey population: {self.prey_population}\n"
+            f"Initial predator population: {self.predator_population}\n"
+            f"Time step: {self.time_step} from {self.start_time} to {self.final_time} (order {self.order})\n"
+            f"{self.prey}\n"
+            f"{self.predator}"
+        )
+
+    def _make_step(self):
+        prey_growth = float(self.prey.growth_rate)
+        prey_control = float(self.prey.control_rate)
+        predator_growth = float(self.predator.growth_rate)
+        predator_control = float(self.predator.control_rate)
+        h = self.time_step
+        exp = math.exp
+        # Order 4 composes three order-2 steps of h * (outer, inner, outer)
+        sizes = (h,) if self.order == 2 else (h * _YOSHIDA_OUTER, h * _YOSHIDA_INNER, h * _YOSHIDA_OUTER)
+
+        def step(current_prey, current_pred):
+            prey_population = current_prey
+            predator_population = current_pred
+            try:
+                for size in sizes:
+                    prey_population *= exp(0.5 * size * (prey_growth + prey_control * predator_population))
+                    predator_population *= exp(size * (predator_growth + predator_control * prey_population))
+                    prey_population *= exp(0.5 * size * (prey_growth + prey_control * predator_population))
+            except OverflowError:
+                # Too large a step blows up like any explicit method would, as inf rather than an exception
+                prey_population = predator_population = math.inf
+
+            # The table's derivative columns hold the mean slope over the step, like RungeKutta's weighted average
+            return (prey_population, (prey_population - current_prey) / h,
+                    predator_population, (predator_population - current_pred) / h)
+
+        return step
+
+    # The output layout and state handling are the same as RungeKutta's
+    calculate_table = RungeKutta.calculate_table
+    calculate_points = RungeKutta.calculate_points
+    _first_row = RungeKutta._first_row
+    iter_chunks = RungeKutta.iter_chunks
+    iter_points = RungeKutta.iter_points
+
+
+class DormandPrince:
+    def __init__(self, initial_prey_population, initial_predator_population, prey, predator, tolerance, start_time,
+                 final_time, output_times=None, max_steps=DP_MAX_STEPS):
+        # Doubles carry about 16 digits; asking for more only shrinks the steps until they stop moving time
+        if not tolerance >= DP_MIN_TOLERANCE:
+            raise ValueError(f"Tolerance must be at least {DP_MIN_TOLERANCE:.1e}.")
+        self.prey_population = initial_prey_population
+        self.predator_population = initial_predator_population
+        self.prey = prey
+        self.predator = predator
+        self.tolerance = tolerance
+        self.start_time = start_time
+        self.final_time = final_time
+        self.output_times = output_times
+        # Attempted steps, accepted or rejected, before giving up; None for no limit
+        self.max_steps = max_steps
+        self.evaluations = 0
+        self.accepted_steps = 0
+        self.rejected_steps = 0
+
+    def __str__(self):
+        return (
+            f"Initial prey population: {self.prey_population}\n"
+            f"Initial predator population: {self.predator_population}\n"
+            f"Tolerance: {self.tolerance} from {self.start_time} to {self.final_time}\n"
+            f"{self.prey}\n"
+            f"{self.predator}"
+        )
+
+    def _derivative(self, prey_population, predator_population):
+        self.evaluations += 1
+        return self.prey.rhs(prey_population, predator_population), self.predator.rhs(prey_population,
+                                                                                      predator_population)
+
+    def _error_norm(self, error_prey, error_pred, scale_prey, scale_pred):
+        return math.sqrt(((error_prey / scale_prey) ** 2 + (error_pred / scale_pred) ** 2) / 2)
+
+    def _initial_step(self, prey_population, predator_population, d_prey, d_pred):
+        # Hairer, Norsett & Wanner's starting step estimate, without the second-derivative refinement
+        scale_prey = self.tolerance + self.tolerance * abs(prey_population)
+        scale_pred = self.tolerance + self.tolerance * abs(predator_population)
+        d0 = self._error_norm(prey_population, predator_population, scale_prey, scale_pred)
+        d1 = self._error_norm(d_prey, d_pred, scale_prey, scale_pred)
+        h = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+        return min(h, self.final_time - self.start_time)
+
+    def _integrate(self):
+        # Returns the start time, size, starting state and stage derivatives of every accepted step
+        evaluations = self.evaluations
+        time = self.start_time
+        current_prey = self.prey_population
+        current_pred = self.predator_population
+        k_prey = [0.0] * 7
+        k_pred = [0.0] * 7
+        k_prey[0], k_pred[0] = self._derivative(current_prey, current_pred)
+        h = self._initial_step(current_prey, current_pred, k_prey[0], k_pred[0])
+
+        step_times, step_sizes, step_states, step_stages = [], [], [], []
+        attempts = 0
+
+        while time < self.final_time:
+            # Below a few ulps of the current time the step no longer moves it, so the loop would never end
+            if h < 16 * sys.float_info.epsilon * max(abs(time), 1):
+                raise ValueError(f"Step size too small at time {time:g}; tolerance {self.tolerance:g} cannot be met.")
+            if self.max_steps is not None and attempts >= self.max_steps:
+                raise ValueError(f"Gave up after {self.max_steps} steps at time {time:g}; "
+                                 f"try a looser tolerance than {self.tolerance:g}.")
+            attempts += 1
+            h = min(h, self.final_time - time)
+
+            for stage in range(1, 7):
+                weights = _DP_A[stage]
+                stage_prey = current_prey + h * sum(a * k for a, k in zip(weights, k_prey))
+                stage_pred = current_pred + h * sum(a * k for a, k in zip(weights, k_pred))
+                k_prey[stage], k_pred[stage] = self._derivative(stage_prey, stage_pred)
+
+            # The seventh stage is evaluated at the 5th-order solution
+            new_prey, new_pred = stage_prey, stage_pred
+            error_prey = h * sum(e * k for e, k in zip(_DP_E, k_prey))
+            error_pred = h * sum(e * k for e, k in zip(_DP_E, k_pred))
+            scale_prey = self.tolerance + self.tolerance * max(abs(current_prey), abs(new_prey))
+            scale_pred = self.tolerance + self.tolerance * max(abs(current_pred), abs(new_pred))
+            error = self._error_norm(error_prey, error_pred, scale_prey, scale_pred)
+
+            if error > 1:
+                self.rejected_steps += 1
+                h *= max(0.2, 0.9 * error ** -0.2)
+                continue
+
+            self.accepted_steps += 1
+            step_times.append(time)
+            step_sizes.append(h)
+            step_states.append((current_prey, current_pred))
+            step_stages.append((tuple(k_prey), tuple(k_pred)))
+
             time += h
+            current_prey = max(0, new_prey)
+            current_pred = max(0, new_pred)
+
+            # First same as last, unless clamping moved the state off the last stage
+            if current_prey == new_prey and current_pred == new_pred:
+                k_prey[0], k_pred[0] = k_prey[6], k_pred[6]
+            else:
+                k_prey[0], k_pred[0] = self._derivative(current_prey, current_pred)
 
-            results.append((time, current_prey, current_pred))
+            h *= 10 if error == 0 else min(10, 0.9 * error ** -0.2)
 
         self.prey_population = current_prey
         self.predator_population = current_pred
+        profiling.count("DormandPrince.prey_rhs", self.evaluations - evaluations)
+        profiling.count("DormandPrince.predator_rhs", self.evaluations - evaluations)
+        return (np.array(step_times), np.array(step_sizes), np.array(step_states).reshape(-1, 2),
+                np.array(step_stages).reshape(-1, 2, 7), time, (current_prey, current_pred))
+
+    def _dense_output(self):
+        step_times, step_sizes, step_states, step_stages, end_time, end_state = self._integrate()
+
+        if self.output_times is None:
+            # Without a requested grid, report every accepted step
+            output_times = np.append(step_times, end_time)
+        else:
+            output_times = np.asarray(self.output_times, dtype=float)
+            if output_times.size and (output_times.min() < self.start_time or output_times.max() > end_time):
+                raise ValueError("Output times must lie between the start time and the final time.")
+
+        populations = np.empty((len(output_times), 2))
+        at_end = output_times >= end_time
+        populations[at_end] = end_state
+
+        inside = ~at_end
+        step = np.searchsorted(step_times, output_times[inside], side="right") - 1
+        sizes = step_sizes[step]
+        fraction = (output_times[inside] - step_times[step]) / sizes
+        powers = np.cumprod(np.repeat(fraction[:, None], 4, axis=1), axis=1)
+        # y(t0 + x h) = y0 + h * K @ P @ [x, x^2, x^3, x^4] for each requested time
+        interpolated = np.einsum("nsk,kp,np->ns", step_stages[step], _DP_P, powers)
+        populations[inside] = np.maximum(step_states[step] + sizes[:, None] * interpolated, 0)
+        return output_times, populations
+
+    def calculate_table(self):
+        times, populations = self._dense_output()
+        results = np.empty((len(times), len(TABLE_COLUMNS)))
+        results[:, 0] = times
+        results[:, 1] = populations[:, 0]
+        results[:, 3] = populations[:, 1]
+        results[:, 2] = self.prey.rhs(populations[:, 0], populations[:, 1])
+        results[:, 4] = self.predator.rhs(populations[:, 0], populations[:, 1])
         return results
 
-class Visualizer:
-    def print_table(self, results):
-        headers = ["Time", "Prey", "ΔPrey", "Predator", "ΔPredator"]
-        table_data = [[f"{t:.2f}", f"{prey:.4f}", f"{d_prey:.4f}", f"{predator:.4f}", f"{d_predator:.4f}"] for
-                      t, prey, d_prey, predator, d_predator in results]
+    def calculate_points(self):
+        times, populations = self._dense_output()
+        results = np.empty((len(times), len(POINT_COLUMNS)))
+        results[:, 0] = times
+        results[:, 1:] = populations
+        return results
+
+
+class BatchEuler:
+    def __init__(self, initial_prey_populations, initial_predator_populations, prey, predator, time_step, start_time,
+                 final_time, prey_growth_rates=None, prey_control_rates=None, predator_growth_rates=None,
+                 predator_control_rates=None):
+        self.prey_populations, self.predator_populations = _batch_populations(initial_prey_populations,
+                                                                              initial_predator_populations)
+        count = len(self.prey_populations)
+        self.prey = _batch_equation(Prey, prey, prey_growth_rates, prey_control_rates, count)
+        self.predator = _batch_equation(Predator, predator, predator_growth_rates, predator_control_rates, count)
+        self.time_step = time_step
+        self.start_time = start_time
+        self.final_time = final_time
+
+    def __str__(self):
+        return (
+            f"Trajectories: {len(self.prey_populations)}\n"
+            f"Time step: {self.time_step} from {self.start_time} to {self.final_time}\n"
+            f"{self.prey}\n"
+            f"{self.predator}"
+        )
 
-        print("\n" + tabulate(table_data, headers=headers, tablefmt="grid"))
+    def _step(self, prey_populations, predator_populations):
+        d_prey = self.prey.rhs(prey_populations, predator_populations)
+        d_predator = self.predator.rhs(prey_populations, predator_populations)
+        return (_clamp(prey_populations + d_prey * self.time_step),
+                _clamp(predator_populations + d_predator * self.time_step))
 
-    def print_points(self, results):
-        headers = ["Time", "Prey", "Predator"]
-        table_data = [[f"{t:.2f}", f"{prey:.4f}", f"{predator:.4f}"] for
-                      t, prey, predator, in results]
+    def calculate_points(self):
+        # Without a chunk size the first chunk is the whole run
+        return next(self.iter_chunks(chunk_size=None))
+
+    def iter_chunks(self, chunk_size=4096):
+        # (n_trajectories, rows, 3) chunks; Euler.calculate_points takes one step before its loop, so this does too
+        return _iter_batch_chunks(self, chunk_size, step_before_first_row=True)
+
+
+class BatchRungeKutta:
+    def __init__(self, initial_prey_populations, initial_predator_populations, prey, predator, time_step, start_time,
+                 final_time, prey_growth_rates=None, prey_control_rates=None, predator_growth_rates=None,
+                 predator_control_rates=None):
+        self.prey_populations, self.predator_populations = _batch_populations(initial_prey_populations,
+                                                                              initial_predator_populations)
+        count = len(self.prey_populations)
+        self.prey = _batch_equation(Prey, prey, prey_growth_rates, prey_control_rates, count)
+        self.predator = _batch_equation(Predator, predator, predator_growth_rates, predator_control_rates, count)
+        self.time_step = time_step
+        self.start_time = start_time
+        self.final_time = final_time
 
-        print("\n" + tabulate(table_data, headers=headers, tablefmt="grid"))
+    def __str__(self):
+        return (
+            f"Trajectories: {len(self.prey_populations)}\n"
+            f"Time step: {self.time_step} from {self.start_time} to {self.final_time}\n"
+            f"{self.prey}\n"
+            f"{self.predator}"
+        )
+
+    def _step(self, current_prey, current_pred):
+        h = self.time_step
+        change_in_prey = self.prey.rhs
+        change_in_predator = self.predator.rhs
+
+        k1_prey = change_in_prey(current_prey, current_pred)
+        k1_pred = change_in_predator(current_prey, current_pred)
+
+        mid_prey = current_prey + 0.5 * h * k1_prey
+        mid_pred = current_pred + 0.5 * h * k1_pred
+        k2_prey = change_in_prey(mid_prey, mid_pred)
+        k2_pred = change_in_predator(mid_prey, mid_pred)
+
+        mid_prey = current_prey + 0.5 * h * k2_prey
+        mid_pred = current_pred + 0.5 * h * k2_pred
+        k3_prey = change_in_prey(mid_prey, mid_pred)
+        k3_pred = change_in_predator(mid_prey, mid_pred)
+
+        end_prey = current_prey + h * k3_prey
+        end_pred = current_pred + h * k3_pred
+        k4_prey = change_in_prey(end_prey, end_pred)
+        k4_pred = change_in_predator(end_prey, end_pred)
+
+        delta_prey = (k1_prey + 2 * k2_prey + 2 * k3_prey + k4_prey) / 6
+        delta_pred = (k1_pred + 2 * k2_pred + 2 * k3_pred + k4_pred) / 6
+
+        return _clamp(current_prey + h * delta_prey), _clamp(current_pred + h * delta_pred)
+
+    def calculate_points(self):
+        # Without a chunk size the first chunk is the whole run
+        return next(self.iter_chunks(chunk_size=None))
+
+    def iter_chunks(self, chunk_size=4096):
+        # (n_trajectories, rows, 3) chunks, so long batch runs can be summarised without holding every step
+        return _iter_batch_chunks(self, chunk_size, step_before_first_row=False)
+
+
+def _iter_batch_chunks(batch, chunk_size, step_before_first_row):
+    times = _time_grid(batch.start_time, batch.final_time, batch.time_step)
+    chunk_size = chunk_size or len(times)
+    first_prey = batch.prey_populations
+    first_pred = batch.predator_populations
+
+    # One vectorised call per step (Euler) or stage (Runge-Kutta) covers every trajectory
+    calls = len(times) if step_before_first_row else 4 * (len(times) - 1)
+    profiling.count(type(batch).__name__ + ".prey_rhs", calls)
+    profiling.count(type(batch).__name__ + ".predator_rhs", calls)
+
+    current_prey, current_pred = first_prey, first_pred
+    if step_before_first_row:
+        current_prey, current_pred = batch._step(current_prey, current_pred)
+
+    for start in range(0, len(times), chunk_size):
+        stop = min(start + chunk_size, len(times))
+        chunk = np.empty((len(first_prey), stop - start, 3))
+        chunk[:, :, 0] = times[start:stop]
+        for i in range(start, stop):
+            if i == 0:
+                chunk[:, 0, 1] = first_prey
+                chunk[:, 0, 2] = first_pred
+                continue
+            current_prey, current_pred = batch._step(current_prey, current_pred)
+            chunk[:, i - start, 1] = current_prey
+            chunk[:, i - start, 2] = current_pred
+
+        batch.prey_populations = current_prey
+        batch.predator_populations = current_pred
+        yield chunk
+
+
+def _batch_populations(initial_prey_populations, initial_predator_populations):
+    prey_populations, predator_populations = np.broadcast_arrays(
+        np.asarray(initial_prey_populations, dtype=float).ravel(),
+        np.asarray(initial_predator_populations, dtype=float).ravel())
+    return prey_populations.copy(), predator_populations.copy()
+
+
+def _batch_equation(cls, equation, growth_rates, control_rates, count):
+    # Per-trajectory rates are broadcast against the number of trajectories; missing ones fall back to the scalar rate
+    if growth_rates is None and control_rates is None:
+        return equation
+    if equation.equation is not None:
+        raise ValueError("Per-trajectory rates only apply to the standard growth + interaction form.")
+
+    growth_rates = equation.growth_rate if growth_rates is None else growth_rates
+    control_rates = equation.control_rate if control_rates is None else control_rates
+    growth_rates = np.broadcast_to(np.asarray(growth_rates, dtype=float), (count,))
+    control_rates = np.broadcast_to(np.asarray(control_rates, dtype=float), (count,))
+    return cls(growth_rates, control_rates, equation.prey_letter, equation.predator_letter)
+
+
+def _row_chunks(results, size=_PRINT_CHUNK_ROWS):
+    for start in range(0, len(results), size):
+        yield results[start:start + size]
+
+
+def _column_widths(results, formats):
+    # Widest formatted value per column; the extremes are the longest for fixed-point output. fmin/fmax skip NaN.
+    if not len(results):
+        return [0] * len(formats)
+    return [max(len(fmt % np.fmin.reduce(column)), len(fmt % np.fmax.reduce(column)))
+            for fmt, column in zip(formats, results.T)]
+
+
+class TableWriter:
+    def __init__(self, file, width, style="grid", widths=None):
+        table = width == len(TABLE_COLUMNS)
+        headers = TABLE_HEADERS if table else POINT_HEADERS
+        formats = _TABLE_FORMATS if table else _POINT_FORMATS
+        self.file = file
+        self.style = style
+        self.rows = 0
+        self._started = False
+
+        if style == "csv":
+            self._header = ",".join(TABLE_COLUMNS if table else POINT_COLUMNS) + "\n"
+            self._row = ",".join([_CSV_FORMAT] * width) + "\n"
+        elif style == "grid":
+            # Streamed rows cannot be re-aligned once written, so the widths are fixed by the caller or the first chunk
+            widths = [max(len(header), size) for header, size in zip(headers, widths or [0] * width)]
+            rule = "+" + "+".join("-" * (size + 2) for size in widths) + "+\n"
+            self._header = (rule + "| " + " | ".join(header.rjust(size) for header, size in zip(headers, widths)) +
+                            " |\n" + rule.replace("-", "="))
+            self._row = ("| " + " | ".join(f"%{size}{fmt[1:]}" for fmt, size in zip(formats, widths)) + " |\n" +
+                         rule)
+            self._gap_width = len(rule) - 5
+        else:
+            raise ValueError(f"Unknown table style: {style}")
+
+    def _start(self):
+        if not self._started:
+            self.file.write(self._header)
+            self._started = True
+
+    def write(self, chunk):
+        self._start()
+        if len(chunk):
+            self.file.write(self._row * len(chunk) % tuple(chunk.ravel().tolist()))
+            self.rows += len(chunk)
+
+    def write_gap(self, skipped):
+        # Marks the rows left out of a head/tail summary; CSV stays machine-readable and gets no marker
+        # The header comes first even when no row has been written yet, as with a tail but no head
+        self._start()
+        if self.style == "grid":
+            text = f"... {skipped} rows omitted ..."
+            self.file.write("| " + text.center(self._gap_width) + " |\n" + self._row[self._row.index("\n") + 1:])
+
+
+def _next_page():
+    try:
+        return input("-- Enter for more, q to stop -- ").strip().lower() != "q"
+    except EOFError:
+        return False
+
+
+def write_table(chunks, file=None, style="grid", head=None, tail=None, page_size=None, widths=None):
+    # Writes rows as the chunks arrive. With `head` and/or `tail` only those rows are shown, with the number skipped in
+    # between; `page_size` pauses for the user after that many rows. Returns the number of rows seen.
+    output = sys.stdout if file is None else file
+    summary = head is not None or tail is not None
+    head = head or 0
+    tail = tail or 0
+    writer = None
+    seen = 0
+    kept = None
+    until_pause = page_size
+
+    def emit(block):
+        nonlocal until_pause
+        while len(block):
+            if page_size:
+                if until_pause == 0:
+                    output.flush()
+                    if not _next_page():
+                        return False
+                    until_pause = page_size
+                part = block[:until_pause]
+                until_pause -= len(part)
+            else:
+                part = block
+            writer.write(part)
+            block = block[len(part):]
+        return True
+
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float)
+        if writer is None:
+            width = chunk.shape[1]
+            formats = _TABLE_FORMATS if width == len(TABLE_COLUMNS) else _POINT_FORMATS
+            writer = TableWriter(output, width, style, widths or _column_widths(chunk, formats))
+
+        first = seen
+        seen += len(chunk)
+        if not summary:
+            if not emit(chunk):
+                return seen
+            continue
+
+        shown = max(min(head - first, len(chunk)), 0)
+        if shown and not emit(chunk[:shown]):
+            return seen
+        if tail:
+            # Only the last `tail` rows past the head are kept
+            rest = chunk[shown:]
+            kept = rest[-tail:] if kept is None else np.concatenate([kept, rest])[-tail:]
+
+    if writer is None:
+        return 0
+    if summary:
+        shown = len(kept) if kept is not None else 0
+        if seen > head + shown:
+            writer.write_gap(seen - head - shown)
+        if shown:
+            emit(kept)
+    output.flush()
+    return seen
+
+
+class Visualizer:
+    def print_table(self, results, file=None, head=None, tail=None, page_size=None):
+        self._print_rows(results, _TABLE_FORMATS, file, head, tail, page_size)
+
+    def print_points(self, results, file=None, head=None, tail=None, page_size=None):
+        self._print_rows(results, _POINT_FORMATS, file, head, tail, page_size)
+
+    def _print_rows(self, results, formats, file, head, tail, page_size):
+        results = np.asarray(results, dtype=float)
+        (sys.stdout if file is None else file).write("\n")
+        with profiling.phase("tabulate"):
+            # The whole array is at hand, so the column widths can cover every row
+            write_table(_row_chunks(results), file, "grid", head, tail, page_size, _column_widths(results, formats))
+
+    def print_file(self, path, head=None, tail=None):
+        # Reads a trajectory saved by storage.save_trajectory without recomputing it
+        from storage import load_trajectory
+
+        trajectory = load_trajectory(path)
+        if trajectory.columns == TABLE_COLUMNS:
+            self.print_table(trajectory.data, head=head, tail=tail)
+        else:
+            self.print_points(trajectory.points, head=head, tail=tail)
+
+    def print_chunks(self, chunks, head=None, tail=None):
+        # Prints each chunk as soon as it is computed; a 5-column chunk is a table, a 3-column chunk is points
+        sys.stdout.write("\n")
+        write_table(chunks, head=head, tail=tail)
+
+    def write_chunks(self, chunks, file):
+        # CSV output one chunk at a time, so memory use does not grow with the length of the run
+        with open(file, "w") as output:
+            write_table(chunks, output, "csv")
 
 
 def main():
@@ -0,0 +1,288 @@
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scenario import build_equations
+from simulation import _time_grid, is_standard
+
+METHODS = ("euler-maruyama", "tau-leap")
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Paths per task; the blocks, and so the random streams, do not depend on the number of workers
+_BLOCK_PATHS = 10_000
+# Histogram bins for the quantiles: zero, then log-spaced from _LOWEST to _HIGHEST (values above land in the top bin)
+_LOWEST = 1e-4
+_HIGHEST = 1e4
+_BINS = 800
+# Poisson means above this are drawn from the normal approximation; numpy rejects means near 2^63
+_POISSON_LIMIT = 1e12
+# Recorded times when no record interval is given. Each block keeps 2 x recorded times x _BINS int64 histogram
+# counts (about 13 MB at this size), so recording every step of a long horizon would cost gigabytes per worker.
+MAX_RECORDED_TIMES = 1000
+
+
+class EnsembleStatistics:
+    # Running per-time statistics of both populations over any number of paths. Sums and histogram counts merge
+    # by addition, so blocks run in different processes combine exactly and memory does not grow with the paths.
+    def __init__(self, times, edges=None):
+        self.times = np.asarray(times, dtype=float)
+        self.edges = np.concatenate(([0.0], np.geomspace(_LOWEST, _HIGHEST, _BINS))) if edges is None else edges
+        self.paths = 0
+        shape = (2, len(self.times))
+        self.sums = np.zeros(shape)
+        self.squares = np.zeros(shape)
+        self.extinct = np.zeros(shape, dtype=np.int64)
+        self.lowest = np.full(shape, np.inf)
+        self.highest = np.full(shape, -np.inf)
+        self.histogram = np.zeros(shape + (len(self.edges) - 1,), dtype=np.int64)
+        # Per path rather than per time, so these grow with the ensemble: 8 bytes per path each
+        self.peak_times = np.empty(0)
+        self.extinction_times = np.empty((2, 0))
+
+    def add(self, row, prey_populations, predator_populations):
+        bins = len(self.edges) - 1
+        for species, values in enumerate((prey_populations, predator_populations)):
+            self.sums[species, row] += values.sum()
+            self.squares[species, row] += np.dot(values, values)
+            self.lowest[species, row] = min(self.lowest[species, row], values.min())
+            self.highest[species, row] = max(self.highest[species, row], values.max())
+            dead = values <= 0
+            self.extinct[species, row] += np.count_nonzero(dead)
+            index = np.clip(np.searchsorted(self.edges, values[~dead], side="right") - 1, 0, bins - 1)
+            self.histogram[species, row] += np.bincount(index, minlength=bins)
+
+    def merge(self, other):
+        self.paths += other.paths
+        self.sums += other.sums
+        self.squares += other.squares
+        self.extinct += other.extinct
+        np.minimum(self.lowest, other.lowest, out=self.lowest)
+        np.maximum(self.highest, other.highest, out=self.highest)
+        self.histogram += other.histogram
+        self.peak_times = np.concatenate((self.peak_times, other.peak_times))
+        self.extinction_times = np.concatenate((self.extinction_times, other.extinction_times), axis=1)
+        return self
+
+    def mean(self):
+        return self.sums / max(self.paths, 1)
+
+    def std(self):
+        mean = self.mean()
+        return np.sqrt(np.maximum(self.squares / max(self.paths, 1) - mean * mean, 0))
+
+    def extinct_fraction(self):
+        return self.extinct / max(self.paths, 1)
+
+    def quantile(self, q):
+        # Extinct paths sit at exactly zero; the rest are interpolated linearly inside their histogram bin, so the
+        # result is accurate to about a bin width (roughly 2% of the value with the default bins) and never leaves
+        # the range the paths actually reached
+        target = q * self.paths
+        counts = np.cumsum(self.histogram, axis=-1) + self.extinct[..., None]
+        index = np.minimum(np.argmax(counts >= target, axis=-1), self.histogram.shape[-1] - 1)
+        in_bin = np.take_along_axis(self.histogram, index[..., None], -1)[..., 0]
+        before = np.take_along_axis(counts, index[..., None], -1)[..., 0] - in_bin
+        fraction = np.clip((target - before) / np.maximum(in_bin, 1), 0, 1)
+        value = self.edges[index] + fraction * (self.edges[index + 1] - self.edges[index])
+        value = np.clip(value, self.lowest, self.highest)
+        return np.where((self.extinct > 0) & (self.extinct >= target), 0.0, value)
+
+    def summary(self, quantiles=QUANTILES):
+        # Column name -> per-time array, in CSV column order
+        columns = {"time": self.times}
+        mean, std, extinct = self.mean(), self.std(), self.extinct_fraction()
+        levels = [(q, self.quantile(q)) for q in quantiles]
+        for species, name in enumerate(("prey", "predator")):
+            columns[name + "_mean"] = mean[species]
+            columns[name + "_std"] = std[species]
+            for q, values in levels:
+                columns[f"{name}_q{q * 100:g}"] = values[species]
+            columns[name + "_extinct"] = extinct[species]
+        return columns
+
+
+def _coefficients(prey, predator):
+    for equation in (prey, predator):
+        if not is_standard(equation):
+            raise ValueError("Stochastic ensembles only support the standard growth + interaction form.")
+    return prey.growth_rate, prey.control_rate, predator.growth_rate, predator.control_rate
+
+
+def _euler_maruyama(prey_populations, predator_populations, coefficients, time_step, system_size, rng):
+    # Demographic noise: each birth, death or predation term adds variance equal to its rate over the system size
+    # (the number of individuals one population unit stands for)
+    a, b, c, d = coefficients
+    interaction = prey_populations * predator_populations
+    terms = ((a * prey_populations, b * interaction), (c * predator_populations, d * interaction))
+    updated = []
+    for populations, (growth, predation) in zip((prey_populations, predator_populations), terms):
+        noise = np.sqrt((np.abs(growth) + np.abs(predation)) * (time_step / system_size))
+        updated.append(populations + (growth + predation) * time_step + noise * rng.standard_normal(len(populations)))
+    return updated
+
+
+def _events(rng, means):
+    large = means > _POISSON_LIMIT
+    counts = rng.poisson(np.where(large, 0, means)).astype(float)
+    if large.any():
+        counts[large] = np.round(means[large] + np.sqrt(means[large]) * rng.standard_normal(np.count_nonzero(large)))
+    return counts
+
+
+def _tau_leap(prey_populations, predator_populations, coefficients, time_step, system_size, rng):
+    # Whole events: each term fires a Poisson number of times per step, each event moving one individual
+    a, b, c, d = coefficients
+    interaction = prey_populations * predator_populations
+    terms = ((a, a * prey_populations, b, b * interaction), (c, c * predator_populations, d, d * interaction))
+    updated = []
+    for populations, (growth_rate, growth, control_rate, predation) in zip((prey_populations, predator_populations),
+                                                                          terms):
+        events = (np.sign(growth_rate) * _events(rng, np.abs(growth) * (system_size * time_step)) +
+                  np.sign(control_rate) * _events(rng, np.abs(predation) * (system_size * time_step)))
+        updated.append(populations + events / system_size)
+    return updated
+
+
+_STEPS = {"euler-maruyama": _euler_maruyama, "tau-leap": _tau_leap}
+
+
+def _recorded_rows(steps, record_every):
+    rows = np.arange(0, steps, record_every)
+    return rows if rows[-1] == steps - 1 else np.append(rows, steps - 1)
+
+
+def _run_block(task):
+    seed, paths, coefficients, initial, time_step, start_time, final_time, system_size, method, record_every = task
+    rng = np.random.default_rng(seed)
+    step = _STEPS[method]
+    times = _time_grid(start_time, final_time, time_step)
+    rows = _recorded_rows(len(times), record_every)
+    statistics = EnsembleStatistics(times[rows])
+    statistics.paths = paths
+
+    prey_populations = np.full(paths, float(initial[0]))
+    predator_populations = np.full(paths, float(initial[1]))
+    peak = prey_populations.copy()
+    peak_times = np.full(paths, times[0])
+    extinction_times = np.full((2, paths), np.inf)
+
+    # Every path advances together, one vectorised step at a time
+    row = 0
+    for i, time in enumerate(times):
+        if i:
+            prey_populations, predator_populations = step(prey_populations, predator_populations, coefficients,
+                                                          time_step, system_size, rng)
+            # Zero is absorbing: every term is proportional to its own population, so a dead population stays dead
+            np.maximum(prey_populations, 0, out=prey_populations)
+            np.maximum(predator_populations, 0, out=predator_populations)
+            higher = prey_populations > peak
+            peak[higher] = prey_populations[higher]
+            peak_times[higher] = time
+            for species, populations in enumerate((prey_populations, predator_populations)):
+                died = (populations <= 0) & np.isinf(extinction_times[species])
+                extinction_times[species, died] = time
+        if row < len(rows) and rows[row] == i:
+            statistics.add(row, prey_populations, predator_populations)
+            row += 1
+
+    statistics.peak_times = peak_times
+    statistics.extinction_times = extinction_times
+    return statistics
+
+
+def ensemble(prey, predator, initial_prey_population, initial_predator_population, time_step, start_time,
+             final_time, paths, system_size=100, method="euler-maruyama", seed=None, workers=None,
+             block_paths=_BLOCK_PATHS, record_every=None):
+    # Runs `paths` noisy copies of the model and returns their merged EnsembleStatistics. The same seed gives the
+    # same result for any number of workers; the entropy actually used is kept as `.seed` to repeat a run.
+    # Without `record_every`, statistics are kept at no more than MAX_RECORDED_TIMES evenly spaced steps.
+    if method not in _STEPS:
+        raise ValueError(f"Unknown method '{method}'. Choose from: {', '.join(METHODS)}")
+    if final_time <= start_time:
+        raise ValueError("Final time must be greater than start time.")
+    if record_every is None:
+        record_every = max(1, math.ceil(len(_time_grid(start_time, final_time, time_step)) / MAX_RECORDED_TIMES))
+    if paths < 1 or system_size <= 0 or record_every < 1:
+        raise ValueError("Paths and record interval must be at least 1 and the system size positive.")
+
+    coefficients = _coefficients(prey, predator)
+    sequence = np.random.SeedSequence(seed)
+    sizes = [min(block_paths, paths - start) for start in range(0, paths, block_paths)]
+    tasks = [(child, size, coefficients, (initial_prey_population, initial_predator_population), time_step,
+              start_time, final_time, system_size, method, record_every)
+             for child, size in zip(sequence.spawn(len(sizes)), sizes)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        statistics = _merge(map(_run_block, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            # map keeps the block order, so per-path arrays come out the same whatever finishes first
+            statistics = _merge(executor.map(_run_block, tasks))
+    statistics.seed = sequence.entropy
+    return statistics
+
+
+def _merge(parts):
+    # Folds blocks in as they arrive instead of holding every block's histograms at once
+    statistics = next(parts)
+    for part in parts:
+        statistics.merge(part)
+    return statistics
+
+
+def _parse_quantiles(text):
+    return tuple(float(value) for value in text.split(","))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a stochastic prey-predator ensemble and print its statistics.")
+    parser.add_argument("--prey", default="3R - 1.4RF", help="prey equation")
+    parser.add_argument("--predator", default="-F + 0.8RF", help="predator equation")
+    parser.add_argument("--initial-prey-population", type=float, default=1)
+    parser.add_argument("--initial-predator-population", type=float, default=1)
+    parser.add_argument("--time-step", type=float, default=0.01)
+    parser.add_argument("--start-time", type=float, default=0)
+    parser.add_argument("--final-time", type=float, default=12)
+    parser.add_argument("--paths", type=int, default=10_000)
+    parser.add_argument("--system-size", type=float, default=100,
+                        help="individuals per population unit; larger means less noise")
+    parser.add_argument("--method", choices=METHODS, default="euler-maruyama")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--record-every", type=int, default=None,
+                        help=f"keep statistics every N steps (default: at most {MAX_RECORDED_TIMES} times, about "
+                             "13 MB of histograms per worker; memory grows with the number of times kept)")
+    parser.add_argument("--quantiles", type=_parse_quantiles, default=QUANTILES, metavar="Q,Q,...")
+    parser.add_argument("--output", default="-", help="CSV file to write, or - for stdout")
+    args = parser.parse_args(argv)
+
+    prey, predator = build_equations(args.prey, args.predator)
+
+    statistics = ensemble(prey, predator, args.initial_prey_population, args.initial_predator_population,
+                          args.time_step, args.start_time, args.final_time, args.paths, args.system_size,
+                          args.method, args.seed, args.workers, record_every=args.record_every)
+
+    columns = statistics.summary(args.quantiles)
+    table = np.column_stack(list(columns.values()))
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        np.savetxt(output, table, fmt="%.10g", delimiter=",", header=",".join(columns), comments="")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    # The per-path results go to stderr so stdout stays a clean CSV
+    peak_quantiles = np.quantile(statistics.peak_times, [0.05, 0.5, 0.95])
+    print(f"Seed: {statistics.seed}", file=sys.stderr)
+    print(f"Extinct by {statistics.times[-1]:g}: prey {np.mean(np.isfinite(statistics.extinction_times[0])):.4f}, "
+          f"predator {np.mean(np.isfinite(statistics.extinction_times[1])):.4f}", file=sys.stderr)
+    print("Prey peak time 5/50/95%: " + " / ".join(f"{value:.4g}" for value in peak_quantiles), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
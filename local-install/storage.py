@@ -0,0 +1,143 @@
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from equation import standard_equation
+from simulation import POINT_COLUMNS, TABLE_COLUMNS
+
+# File layout: magic, little-endian uint32 header length, JSON header padded with spaces so the data starts on a
+# 64-byte boundary, then raw little-endian float64 rows. The row count is implied by the file size, which lets a
+# writer append chunks without going back to patch the header.
+MAGIC = b"LVTRAJ01"
+_ALIGNMENT = 64
+_DTYPE = np.dtype("<f8")
+
+
+def simulation_metadata(simulation):
+    prey = simulation.prey
+    predator = simulation.predator
+    metadata = {
+        "method": type(simulation).__name__,
+        "prey_equation": prey.equation or standard_equation(prey.growth_rate, prey.control_rate, prey.prey_letter,
+                                                            prey.prey_letter, prey.predator_letter),
+        "predator_equation": predator.equation or standard_equation(predator.growth_rate, predator.control_rate,
+                                                                    predator.predator_letter, predator.prey_letter,
+                                                                    predator.predator_letter),
+        "prey_letter": prey.prey_letter,
+        "predator_letter": prey.predator_letter,
+        # Integrators advance these as they run, so take the metadata before calculating
+        "initial_prey_population": simulation.prey_population,
+        "initial_predator_population": simulation.predator_population,
+        "start_time": simulation.start_time,
+        "final_time": simulation.final_time,
+    }
+    for name in ("time_step", "tolerance", "order"):
+        if hasattr(simulation, name):
+            metadata[name] = getattr(simulation, name)
+    return metadata
+
+
+class TrajectoryWriter:
+    def __init__(self, path, columns, **metadata):
+        self.path = path
+        self.columns = tuple(columns)
+        self.rows = 0
+        self._file = open(path, "wb")
+
+        header = dict(metadata, columns=self.columns, dtype=_DTYPE.str)
+        encoded = json.dumps(header, default=float).encode()
+        prefix = len(MAGIC) + 4
+        padded = -(-(prefix + len(encoded) + 1) // _ALIGNMENT) * _ALIGNMENT - prefix
+        self._file.write(MAGIC + struct.pack("<I", padded) + encoded.ljust(padded - 1) + b"\n")
+
+    def write(self, chunk):
+        chunk = np.ascontiguousarray(chunk, dtype=_DTYPE)
+        if chunk.ndim != 2 or chunk.shape[1] != len(self.columns):
+            raise ValueError(f"Expected rows of {len(self.columns)} columns, got shape {chunk.shape}.")
+        self._file.write(chunk.data)
+        self.rows += len(chunk)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Trajectory:
+    def __init__(self, data, metadata):
+        self.data = data
+        self.metadata = metadata
+        self.columns = tuple(metadata["columns"])
+
+    def __len__(self):
+        return len(self.data)
+
+    def column(self, name):
+        return self.data[:, self.columns.index(name)]
+
+    @property
+    def points(self):
+        # (time, prey, predator); a zero-copy view when the file already holds exactly those columns
+        if self.columns == POINT_COLUMNS:
+            return self.data
+        return self.data[:, [self.columns.index(name) for name in POINT_COLUMNS]]
+
+
+def read_header(path):
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a trajectory file.")
+        (length,) = struct.unpack("<I", file.read(4))
+        return json.loads(file.read(length)), len(MAGIC) + 4 + length
+
+
+def load_trajectory(path, mode="r"):
+    metadata, offset = read_header(path)
+    width = len(metadata["columns"])
+    rows = (os.path.getsize(path) - offset) // (width * _DTYPE.itemsize)
+    if rows == 0:
+        data = np.empty((0, width), dtype=_DTYPE)
+    else:
+        data = np.memmap(path, dtype=np.dtype(metadata["dtype"]), mode=mode, offset=offset, shape=(rows, width))
+    return Trajectory(data, metadata)
+
+
+def save_trajectory(path, results, simulation=None, columns=None, **metadata):
+    # `results` may be a whole array or an iterator of chunks, such as Euler.iter_chunks(); chunks are written as
+    # they arrive
+    if simulation is not None:
+        metadata = dict(simulation_metadata(simulation), **metadata)
+
+    chunks = results if iter(results) is results else iter([np.asarray(results, dtype=float)])
+    first = next(chunks, None)
+
+    if columns is None:
+        width = len(POINT_COLUMNS) if first is None else first.shape[1]
+        columns = TABLE_COLUMNS if width == len(TABLE_COLUMNS) else POINT_COLUMNS
+
+    with TrajectoryWriter(path, columns, **metadata) as writer:
+        if first is not None:
+            writer.write(first)
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.rows
+
+
+def main():
+    for path in sys.argv[1:]:
+        trajectory = load_trajectory(path)
+        print(f"{path}: {len(trajectory)} rows of {', '.join(trajectory.columns)}")
+        for name, value in trajectory.metadata.items():
+            if name not in ("columns", "dtype"):
+                print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
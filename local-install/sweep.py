@@ -0,0 +1,163 @@
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from equation import find_letters, linear_coefficients, parse_terms
+from analysis import StreamingAnalyzer
+from simulation import BatchEuler, BatchRungeKutta, Predator, Prey, is_standard
+
+PARAMETERS = ("prey_growth_rate", "prey_control_rate", "predator_growth_rate", "predator_control_rate",
+              "initial_prey_population", "initial_predator_population", "time_step")
+SUMMARIES = ("period", "prey_amplitude", "predator_amplitude", "prey_extinction_time", "predator_extinction_time",
+             "final_prey", "final_predator", "invariant_drift")
+METHODS = {"euler": BatchEuler, "runge-kutta": BatchRungeKutta}
+
+# Steps per streamed batch chunk
+_CHUNK_STEPS = 4096
+
+
+def parameter_grid(**values):
+    # Cartesian product of the given values in a fixed order: the last parameter varies fastest
+    missing = [name for name in PARAMETERS if name not in values]
+    if missing:
+        raise ValueError(f"Missing sweep parameters: {', '.join(missing)}")
+
+    combinations = np.array(list(itertools.product(*(np.atleast_1d(values[name]) for name in PARAMETERS))),
+                            dtype=float).reshape(-1, len(PARAMETERS))
+    return {name: combinations[:, i] for i, name in enumerate(PARAMETERS)}
+
+
+def _run_chunk(task):
+    parameters, method, letters, start_time, final_time = task
+    prey_letter, predator_letter = letters
+    summaries = {name: np.empty(len(parameters["time_step"])) for name in SUMMARIES}
+
+    # Runs sharing a time step share a time grid, so they can be advanced together in one batch
+    for time_step in np.unique(parameters["time_step"]):
+        rows = np.flatnonzero(parameters["time_step"] == time_step)
+        prey = Prey(0, 0, prey_letter, predator_letter)
+        predator = Predator(0, 0, prey_letter, predator_letter)
+        batch = METHODS[method](parameters["initial_prey_population"][rows],
+                                parameters["initial_predator_population"][rows], prey, predator, time_step,
+                                start_time, final_time,
+                                prey_growth_rates=parameters["prey_growth_rate"][rows],
+                                prey_control_rates=parameters["prey_control_rate"][rows],
+                                predator_growth_rates=parameters["predator_growth_rate"][rows],
+                                predator_control_rates=parameters["predator_control_rate"][rows])
+        # Streamed, so a worker holds one chunk of steps per batch rather than whole trajectories
+        analyzer = StreamingAnalyzer(batch.prey, batch.predator)
+        for chunk in batch.iter_chunks(_CHUNK_STEPS):
+            analyzer.update(chunk)
+        summary = analyzer.summary()
+        for name in SUMMARIES:
+            summaries[name][rows] = summary[name]
+
+    return summaries
+
+
+def sweep(grid, method="runge-kutta", start_time=0, final_time=12, workers=None, chunk_size=None,
+          letters=("R", "F")):
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'. Choose from: {', '.join(METHODS)}")
+
+    grid = {name: np.asarray(grid[name], dtype=float) for name in PARAMETERS}
+    runs = len(grid["time_step"])
+    workers = workers or os.cpu_count() or 1
+
+    if chunk_size is None:
+        chunk_size = max(1, -(-runs // workers))
+
+    tasks = [({name: values[i:i + chunk_size] for name, values in grid.items()}, method, letters, start_time,
+              final_time) for i in range(0, runs, chunk_size)]
+
+    if workers == 1 or len(tasks) <= 1:
+        parts = [_run_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map keeps the submission order, so results line up with the grid whatever finishes first
+            parts = list(executor.map(_run_chunk, tasks))
+
+    results = dict(grid)
+    for name in SUMMARIES:
+        results[name] = np.concatenate([part[name] for part in parts]) if parts else np.empty(0)
+    return results
+
+
+def _parse_values(text):
+    # "0.5,1,2" is a list of values; "start:stop:count" is an evenly spaced range including both ends
+    if ":" in text:
+        start, stop, count = text.split(":")
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(value) for value in text.split(",")])
+
+
+def _join_negative_values(argv, options):
+    # argparse reads the "-1,-0.5" of "--predator-growth-rate -1,-0.5" as another option, and most rates here are
+    # negative, so each of `options` followed by such a value is rewritten to the "--option=-1,-0.5" form
+    argv = list(sys.argv[1:] if argv is None else argv)
+    joined = []
+    while argv:
+        argument = argv.pop(0)
+        if argument in options and argv and argv[0].startswith("-") and not argv[0].startswith("--"):
+            argument = f"{argument}={argv.pop(0)}"
+        joined.append(argument)
+    return joined
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep prey-predator parameters across CPU cores.")
+    parser.add_argument("--prey", default="3R - 1.4RF", help="base prey equation")
+    parser.add_argument("--predator", default="-F + 0.8RF", help="base predator equation")
+    parser.add_argument("--method", choices=METHODS, default="runge-kutta")
+    parser.add_argument("--start-time", type=float, default=0)
+    parser.add_argument("--final-time", type=float, default=12)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="runs per worker task")
+    parser.add_argument("--output", default="-", help="CSV file to write, or - for stdout")
+    for name in PARAMETERS:
+        parser.add_argument("--" + name.replace("_", "-"), type=_parse_values, default=None,
+                            metavar="VALUES", help="comma separated values or start:stop:count")
+    options = ["--prey", "--predator"] + ["--" + name.replace("_", "-") for name in PARAMETERS]
+    args = parser.parse_args(_join_negative_values(argv, options))
+
+    prey_terms = parse_terms(args.prey)
+    predator_terms = parse_terms(args.predator)
+    prey_letter, predator_letter = find_letters(prey_terms)
+    prey = Prey(*linear_coefficients(prey_terms, prey_letter, prey_letter, predator_letter), prey_letter,
+                predator_letter, args.prey)
+    predator = Predator(*linear_coefficients(predator_terms, predator_letter, prey_letter, predator_letter),
+                        prey_letter, predator_letter, args.predator)
+    # Every run is rebuilt from the four rates, so any other term would be silently dropped
+    for equation in (prey, predator):
+        if not is_standard(equation):
+            parser.error("sweeps only support the standard growth + interaction form")
+    defaults = {
+        "prey_growth_rate": prey.growth_rate,
+        "prey_control_rate": prey.control_rate,
+        "predator_growth_rate": predator.growth_rate,
+        "predator_control_rate": predator.control_rate,
+        "initial_prey_population": 1,
+        "initial_predator_population": 1,
+        "time_step": 0.05,
+    }
+    values = {name: defaults[name] if getattr(args, name) is None else getattr(args, name) for name in PARAMETERS}
+
+    results = sweep(parameter_grid(**values), args.method, args.start_time, args.final_time, args.workers,
+                    args.chunk_size, (prey_letter, predator_letter))
+
+    columns = PARAMETERS + SUMMARIES
+    table = np.column_stack([results[name] for name in columns])
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        np.savetxt(output, table, fmt="%.10g", delimiter=",", header=",".join(columns), comments="")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
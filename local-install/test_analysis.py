@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from analysis import analyze
+from simulation import BatchEuler, Euler, Predator, Prey
+
+
+def _extinct_run():
+    # Euler spirals outwards on this model until the prey hits zero, about halfway through the run
+    prey = Prey(3, -1.4, "R", "F")
+    predator = Predator(-1, 0.8, "R", "F")
+    return np.asarray(Euler(1, 1, prey, predator, 0.05, 0, 50).calculate_points()), prey, predator
+
+
+def test_drift_before_extinction_is_kept():
+    points, prey, predator = _extinct_run()
+    summary = analyze(points, prey, predator).summary()
+    assert summary["prey_extinction_time"] < 50
+    assert summary["invariant_drift"] == pytest.approx(13.669218, rel=1e-6)
+
+
+@pytest.mark.parametrize("chunk_size", [2, 7, 100, 4096])
+def test_chunked_drift_matches_whole_array(chunk_size):
+    points, prey, predator = _extinct_run()
+    whole = analyze(points, prey, predator).summary()
+    chunks = (points[start:start + chunk_size] for start in range(0, len(points), chunk_size))
+    chunked = analyze(chunks, prey, predator).summary()
+    assert chunked["invariant_drift"] == whole["invariant_drift"]
+
+
+def test_batch_drift_matches_single_runs():
+    points, prey, predator = _extinct_run()
+    batch = BatchEuler([1, 2], [1, 1], prey, predator, 0.05, 0, 50)
+    drift = analyze(batch.iter_chunks(100), batch.prey, batch.predator).summary()["invariant_drift"]
+    assert drift[0] == pytest.approx(analyze(points, prey, predator).summary()["invariant_drift"])
@@ -0,0 +1,49 @@
+import pytest
+
+from equation import MAX_POWER, compile_equation, parse_terms
+from main import parse_equation
+
+# (growth rate, interaction rate, prey letter, predator letter) as the original regex parser read each equation
+ORIGINAL_PARSES = [
+    ("3R - 1.4RF", (3.0, -1.4, "R", "F")),
+    ("-F + 0.8RF", (-1.0, 0.8, "R", "F")),
+    ("3E - 1.4EF", (3.0, -1.4, "E", "F")),
+    ("-E + 0.8EF", (-1.0, 0.8, "E", "F")),
+    ("3.R - 1.4RF", (3.0, -1.4, "R", "F")),
+    ("3.0R-1.4RF", (3.0, -1.4, "R", "F")),
+    (".5R - .25RF", (0.5, -0.25, "R", "F")),
+    ("R - RF", (1.0, -1.0, "R", "F")),
+    ("+3R -1.4RF", (3.0, -1.4, "R", "F")),
+    ("-1F + 0.8RF", (-1.0, 0.8, "R", "F")),
+    ("2A-0.5AB", (2.0, -0.5, "A", "B")),
+    ("-0.5B+0.1AB", (-0.5, 0.1, "A", "B")),
+    ("3E+2 - EF", (3.0, -1.0, "E", "F")),
+]
+
+
+@pytest.mark.parametrize("equation, expected", ORIGINAL_PARSES)
+def test_original_equations_parse_the_same(equation, expected):
+    assert parse_equation(equation) == expected
+
+
+def test_uppercase_e_is_a_variable_not_an_exponent():
+    assert parse_terms("3E+2 - EF") == [(3.0, (("E", 1),)), (2.0, ()), (-1.0, (("E", 1), ("F", 1)))]
+    assert compile_equation("3E+2 - EF", "E", "F")(1.0, 1.0) == 4.0
+
+
+def test_lowercase_exponent_coefficient():
+    # standard_equation writes coefficients with repr(), which uses exponents for very small and large rates
+    assert parse_terms("1e-05R + 2.5e+16RF") == [(1e-05, (("R", 1),)), (2.5e+16, (("R", 1), ("F", 1)))]
+
+
+def test_powers_compile_to_exponentiation():
+    rhs = compile_equation("3R^100 - 1.4RF", "R", "F")
+    assert "prey**100" in rhs.source
+    assert rhs(1.0, 1.0) == pytest.approx(1.6)
+
+
+def test_power_above_limit_is_rejected():
+    with pytest.raises(ValueError):
+        parse_terms(f"3R^{MAX_POWER + 1} - 1.4RF")
+    with pytest.raises(ValueError):
+        compile_equation("3R^100000 - 1.4RF", "R", "F")
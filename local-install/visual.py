@@ -1,12 +1,35 @@
 import numpy as np
 import vispy.scene
 import vispy.app
-import math
+import vispy.color
+import os
+import queue
+import sys
+import threading
 
+from vispy import gloo
 from vispy.scene import visuals
+from vispy.visuals import Visual
+
+import profiling
+from render import VIEWS, camera_pose, turntable_angles
+from storage import load_trajectory, save_trajectory
 
 g_view = None
 g_camera = None
+g_canvas = None
+g_line = None
+g_full_data = None
+g_lod_timer = None
+
+# Live plots grow in blocks of this many vertices; only the newest block is re-uploaded as points arrive
+LIVE_BLOCK_POINTS = 65536
+
+# Vertices drawn per horizontal pixel of the canvas before level-of-detail decimation kicks in
+LOD_VERTICES_PER_PIXEL = 8
+
+# Total vertices draw_graphs uploads; each curve keeps the single-curve budget until this is shared out
+MULTI_VERTEX_LIMIT = 4_000_000
 
 max_time = None
 max_prey = None
@@ -14,41 +37,84 @@ max_predator = None
 mid_time = None
 mid_prey = None
 mid_predator = None
+g_bounds = None
 
 def _set_camera_from_position_and_target(cam, position, target):
-    px, py, pz = position
-    tx, ty, tz = target
+    cam.center, cam.distance, cam.azimuth, cam.elevation = turntable_angles(position, target)
 
-    vx = px - tx
-    vy = py - ty
-    vz = pz - tz
+def _collect_chunks(chunks):
+    # Keeps only the plotted columns of each streamed chunk; table chunks carry the derivatives in columns 2 and 4
+    points = []
+    for chunk in chunks:
+        points.append(chunk[:, [0, 1, 3]] if chunk.shape[1] == 5 else chunk[:, :3])
+    return np.concatenate(points)
 
-    distance = math.sqrt(vx*vx + vy*vy + vz*vz)
-    azimuth = math.degrees(math.atan2(vz, vx))
-    elevation = math.degrees(math.asin(vy / distance))
+def decimation_indices(data, budget):
+    # Min/max per bucket: each bucket keeps its first and last vertex and the extremes of both populations,
+    # so peaks survive even when thousands of points share a pixel
+    count = len(data)
+    if count <= budget:
+        return np.arange(count)
 
-    cam.center = target
-    cam.distance = distance
-    cam.azimuth = azimuth
-    cam.elevation = elevation
+    size = -(-count * 6 // max(budget, 6))
+    starts = np.arange(0, count, size)
+    picks = [starts, np.minimum(starts + size, count) - 1]
 
-def draw_graph(data):
-    global g_view, g_camera
-    global max_time, max_prey, max_predator
-    global mid_time, mid_prey, mid_predator
+    padding = len(starts) * size - count
+    for column in (1, 2):
+        values = np.pad(data[:, column], (0, padding), mode="edge").reshape(-1, size)
+        picks.append(np.minimum(starts + values.argmin(axis=1), count - 1))
+        picks.append(np.minimum(starts + values.argmax(axis=1), count - 1))
 
-    data = np.array(data)
+    return np.unique(np.concatenate(picks))
 
-    time = data[:, 0]
-    prey = data[:, 1]
-    predator = data[:, 2]
+def decimate(data, budget):
+    return data[decimation_indices(data, budget)]
 
-    canvas = vispy.scene.SceneCanvas(keys='interactive', show=True, bgcolor='black', size=(800, 600))
-    g_view = canvas.central_widget.add_view()
+def _lod_indices(data, budget, window=None):
+    # A coarse pass over the whole run plus a full-budget pass over the visible time window
+    overview = decimation_indices(data, budget // 2)
+    if window is None:
+        return overview
+
+    start, stop = np.searchsorted(data[:, 0], window)
+    start = max(start - 1, 0)
+    stop = min(stop + 1, len(data))
+    detail = start + decimation_indices(data[start:stop], budget)
+    return np.union1d(overview, detail)
+
+def _lod_budget():
+    return LOD_VERTICES_PER_PIXEL * g_canvas.size[0]
+
+def _update_level_of_detail(event=None):
+    if g_line is None or g_full_data is None:
+        return
+
+    # The turntable's scale factor is the world-space extent shown across the view
+    width, height = g_canvas.size
+    half_extent = 0.75 * g_camera.scale_factor * max(width / height, 1)
+    center = g_camera.center[0]
+    with profiling.phase("level_of_detail"):
+        indices = _lod_indices(g_full_data, _lod_budget(), (center - half_extent, center + half_extent))
+        g_line.set_data(pos=g_full_data[indices].astype(np.float32))
 
-    x_min, x_max = time.min(), time.max()
-    y_min, y_max = prey.min(), prey.max()
-    z_min, z_max = predator.min(), predator.max()
+def _schedule_level_of_detail(event=None):
+    # Debounced so a burst of wheel or drag events re-decimates once, after the camera settles
+    g_lod_timer.stop()
+    g_lod_timer.start()
+
+def export_graph_data(path):
+    if g_full_data is None:
+        print("No graph data yet. Run draw_graph(...) first.")
+        return
+    save_trajectory(path, g_full_data)
+
+def _set_bounds(x_min, x_max, y_min, y_max, z_min, z_max):
+    global max_time, max_prey, max_predator
+    global mid_time, mid_prey, mid_predator
+    global g_bounds
+
+    g_bounds = (x_min, x_max, y_min, y_max, z_min, z_max)
 
     max_time = x_max
     max_prey = y_max
@@ -58,61 +124,265 @@ def draw_graph(data):
     mid_prey = (y_min + y_max) / 2.0
     mid_predator = (z_min + z_max) / 2.0
 
+def _add_axes(view, titles=("Time", "Prey", "Predator")):
+    axes = {
+        "time": visuals.Line(color='red', width=2),
+        "prey": visuals.Line(color='green', width=2),
+        "predator": visuals.Line(color='blue', width=2),
+    }
+    for axis in axes.values():
+        view.add(axis)
+
+    labels = {}
+    for name, text in zip(("time", "prey", "predator"), titles):
+        labels[name] = visuals.Text(
+            text=text,
+            color='white',
+            parent=view.scene,
+            font_size=98,
+            anchor_x='center',
+            anchor_y='center',
+        )
+    return axes, labels
+
+def _update_axes(axes_and_labels, bounds=None):
+    axes, labels = axes_and_labels
+    x_min, x_max, y_min, y_max, z_min, z_max = bounds or g_bounds
+    ends = {
+        "time": (x_max, y_min, z_min),
+        "prey": (x_min, y_max, z_min),
+        "predator": (x_min, y_min, z_max),
+    }
+    for name, end in ends.items():
+        axes[name].set_data(pos=np.array([[x_min, y_min, z_min], end]))
+        labels[name].pos = end
+
+def _reset_camera():
+    _set_camera_from_position_and_target(g_camera, *camera_pose("Angler", g_bounds))
+
+def _as_points(data):
+    # A trajectory file, an iterator of chunks or an array, as (time, prey, predator) rows
+    if isinstance(data, (str, os.PathLike)):
+        data = load_trajectory(data).points
+    elif iter(data) is data:
+        data = _collect_chunks(data)
+    return np.asarray(data, dtype=float)[:, :3]
+
+def prepare_graph_data(data, budget):
+    # Everything draw_graph does before touching the GPU, so it can also be timed headless
+    with profiling.phase("convert"):
+        data = _as_points(data)
+        return data, data[_lod_indices(data, budget)].astype(np.float32)
+
+def pack_trajectories(trajectories, budget, limit=MULTI_VERTEX_LIMIT):
+    # Every trajectory in one vertex buffer: `connect` is False at the last vertex of each, so no segment joins two
+    # curves, and `owner` maps each vertex to its trajectory for colouring. `budget` is per curve, `limit` in total.
+    with profiling.phase("convert"):
+        if isinstance(trajectories, np.ndarray) and trajectories.ndim == 3:
+            trajectories = list(trajectories[:, :, :3])
+        else:
+            trajectories = [_as_points(data) for data in trajectories]
+
+        each = max(min(budget, limit // max(len(trajectories), 1)), 16)
+        parts = [data[decimation_indices(data, each)] for data in trajectories]
+        lengths = np.array([len(part) for part in parts])
+        vertices = np.concatenate(parts).astype(np.float32) if parts else np.empty((0, 3), dtype=np.float32)
+
+        connect = np.ones(len(vertices), dtype=bool)
+        connect[np.cumsum(lengths) - 1] = False
+        owner = np.repeat(np.arange(len(parts)), lengths)
+        return vertices, connect, owner
+
+def _profile_draws(canvas):
+    # Frame times include the GPU upload of any vertex data changed since the previous frame
+    if not profiling.ENABLED:
+        return
+    frame = {}
+
+    def begin(event):
+        frame["recording"] = profiling.start_phase("draw")
+
+    def end(event):
+        profiling.end_phase(frame.pop("recording", None))
+
+    canvas.events.draw.connect(begin, position='first')
+    canvas.events.draw.connect(end, position='last')
+
+def draw_graph(data, labels=("Time", "Prey", "Predator")):
+    # `labels` name the three columns of `data`, e.g. any three axes picked by community.select_axes
+    global g_view, g_camera, g_canvas, g_line, g_full_data, g_lod_timer
+
+    canvas = vispy.scene.SceneCanvas(keys='interactive', show=True, bgcolor='black', size=(800, 600))
+    g_canvas = canvas
+    g_view = canvas.central_widget.add_view()
+
+    # Full resolution stays in g_full_data for export; only a decimated copy goes to the GPU
+    g_full_data, vertices = prepare_graph_data(data, _lod_budget())
+    time = g_full_data[:, 0]
+    prey = g_full_data[:, 1]
+    predator = g_full_data[:, 2]
+
+    _set_bounds(time.min(), time.max(), prey.min(), prey.max(), predator.min(), predator.max())
+
     g_camera = vispy.scene.cameras.TurntableCamera(fov=75)
     g_view.camera = g_camera
 
-    line = visuals.Line(
-        pos=np.c_[time, prey, predator],
-        color='white',
-        width=1
-    )
+    with profiling.phase("upload"):
+        line = visuals.Line(
+            pos=vertices,
+            color='white',
+            width=1
+        )
     g_view.add(line)
+    g_line = line
 
-    x_axis = visuals.Line(pos=np.array([[x_min, y_min, z_min], [x_max, y_min, z_min]]),
-                          color='red', width=2)
-    y_axis = visuals.Line(pos=np.array([[x_min, y_min, z_min], [x_min, y_max, z_min]]),
-                          color='green', width=2)
-    z_axis = visuals.Line(pos=np.array([[x_min, y_min, z_min], [x_min, y_min, z_max]]),
-                          color='blue', width=2)
-
-    g_view.add(x_axis)
-    g_view.add(y_axis)
-    g_view.add(z_axis)
-
-    label_time = visuals.Text(
-        text="Time",
-        color='white',
-        pos=(x_max, y_min, z_min),
-        parent=g_view.scene,
-        font_size=98,
-        anchor_x='center',
-        anchor_y='center',
-    )
-    label_prey = visuals.Text(
-        text="Prey",
-        color='white',
-        pos=(x_min, y_max, z_min),
-        parent=g_view.scene,
-        font_size=98,
-        anchor_x='center',
-        anchor_y='center',
-    )
-    label_predator = visuals.Text(
-        text="Predator",
-        color='white',
-        pos=(x_min, y_min, z_max),
-        parent=g_view.scene,
-        font_size=98,
-        anchor_x='center',
-        anchor_y='center',
-    )
-
-    init_cam_pos = (x_max * -1, z_max * 1.2, y_max * 0.7)
-    init_cam_target = (mid_time, mid_predator, mid_prey * -1)
-    _set_camera_from_position_and_target(g_camera, init_cam_pos, init_cam_target)
+    _update_axes(_add_axes(g_view, labels))
+    _reset_camera()
+
+    g_lod_timer = vispy.app.Timer(interval=0.15, connect=_update_level_of_detail, iterations=1, start=False)
+    canvas.events.mouse_wheel.connect(_schedule_level_of_detail)
+    canvas.events.mouse_release.connect(_schedule_level_of_detail)
+    canvas.events.key_press.connect(_schedule_level_of_detail)
+    canvas.events.resize.connect(_schedule_level_of_detail)
+    _profile_draws(canvas)
 
     vispy.app.run()
 
+def draw_graphs(trajectories, colors=None):
+    # Overlays many trajectories as a single Line visual, so thousands of curves still cost one draw call.
+    # `colors` gives one colour per trajectory; by default they run through the viridis colormap.
+    global g_view, g_camera, g_canvas, g_line, g_full_data
+
+    size = (800, 600)
+    vertices, connect, owner = pack_trajectories(trajectories, LOD_VERTICES_PER_PIXEL * size[0])
+    count = owner[-1] + 1 if len(owner) else 0
+    if colors is None:
+        palette = vispy.color.get_colormap('viridis')[np.linspace(0, 1, max(count, 1))].rgba
+    else:
+        palette = vispy.color.ColorArray(colors).rgba
+        if len(palette) == 1:
+            palette = np.repeat(palette, max(count, 1), axis=0)
+        elif len(palette) != count:
+            raise ValueError(f"Expected {count} colours, got {len(palette)}.")
+
+    canvas = vispy.scene.SceneCanvas(keys='interactive', show=True, bgcolor='black', size=size)
+    g_canvas = canvas
+    g_view = canvas.central_widget.add_view()
+
+    # Shared bounds of every curve in a single reduction over the packed buffer
+    low = vertices.min(axis=0)
+    high = vertices.max(axis=0)
+    _set_bounds(low[0], high[0], low[1], high[1], low[2], high[2])
+
+    g_camera = vispy.scene.cameras.TurntableCamera(fov=75)
+    g_view.camera = g_camera
+
+    with profiling.phase("upload"):
+        g_line = visuals.Line(pos=vertices, color=palette[owner].astype(np.float32), connect=connect, method='gl',
+                              width=1)
+    g_view.add(g_line)
+    # Level of detail and export work on a single full-resolution curve, which this view does not keep
+    g_full_data = None
+
+    _update_axes(_add_axes(g_view))
+    _reset_camera()
+    _profile_draws(canvas)
+
+    vispy.app.run()
+
+def _produce_chunks(simulation, chunk_size, chunks):
+    results = simulation.iter_chunks(chunk_size) if hasattr(simulation, "iter_chunks") else [simulation.calculate_points()]
+    try:
+        for chunk in results:
+            chunks.put(chunk[:, :3])
+    finally:
+        chunks.put(None)
+
+def draw_graph_live(simulation, chunk_size=4096, interval=1 / 30):
+    global g_view, g_camera, g_canvas, g_line, g_full_data
+
+    # The integrator runs in a worker thread; the canvas timer drains whatever it has produced so far
+    chunks = queue.Queue()
+    worker = threading.Thread(target=_produce_chunks, args=(simulation, chunk_size, chunks), daemon=True)
+
+    canvas = vispy.scene.SceneCanvas(keys='interactive', show=True, bgcolor='black', size=(800, 600))
+    g_canvas = canvas
+    g_view = canvas.central_widget.add_view()
+    g_camera = vispy.scene.cameras.TurntableCamera(fov=75)
+    g_view.camera = g_camera
+    g_full_data = None
+    axes_and_labels = _add_axes(g_view)
+
+    live = {
+        "block": np.empty((LIVE_BLOCK_POINTS, 3), dtype=np.float32),
+        "filled": 0,
+        "received": [],
+        "user_moved": False,
+    }
+    g_line = visuals.Line(color='white', width=1, parent=g_view.scene)
+
+    def append_block(points):
+        global g_line
+        while len(points):
+            block = live["block"]
+            taken = points[:LIVE_BLOCK_POINTS - live["filled"]]
+            block[live["filled"]:live["filled"] + len(taken)] = taken
+            live["filled"] += len(taken)
+            points = points[len(taken):]
+            g_line.set_data(pos=block[:live["filled"]])
+
+            if live["filled"] == LIVE_BLOCK_POINTS:
+                # Freeze the full block; the next one starts at its last vertex so the curve stays joined
+                live["block"] = np.empty_like(block)
+                live["block"][0] = block[-1]
+                live["filled"] = 1
+                g_line = visuals.Line(color='white', width=1, parent=g_view.scene)
+
+    def on_timer(event):
+        global g_full_data
+        arrived = []
+        finished = False
+        while True:
+            try:
+                chunk = chunks.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None:
+                finished = True
+                break
+            arrived.append(chunk)
+
+        if arrived:
+            data = np.concatenate(arrived)
+            live["received"].append(data)
+            bounds = np.array([data.min(axis=0), data.max(axis=0)]).T.ravel()
+            if g_bounds is not None and len(live["received"]) > 1:
+                previous = np.array(g_bounds)
+                bounds[0::2] = np.minimum(bounds[0::2], previous[0::2])
+                bounds[1::2] = np.maximum(bounds[1::2], previous[1::2])
+            _set_bounds(*bounds)
+            with profiling.phase("upload"):
+                append_block(data.astype(np.float32))
+            _update_axes(axes_and_labels)
+            if not live["user_moved"]:
+                _reset_camera()
+
+        if finished:
+            timer.stop()
+            if live["received"]:
+                g_full_data = np.concatenate(live["received"])
+
+    def on_user_move(event):
+        live["user_moved"] = True
+
+    canvas.events.mouse_press.connect(on_user_move)
+    canvas.events.mouse_wheel.connect(on_user_move)
+
+    _profile_draws(canvas)
+    timer = vispy.app.Timer(interval=interval, connect=on_timer, start=True)
+    worker.start()
+    vispy.app.run()
+
 def set_camera_view(view_name: str):
     global g_camera
     if g_camera is None:
@@ -123,50 +393,167 @@ def set_camera_view(view_name: str):
         print("Data not initialized. Draw the graph before setting camera view.")
         return
 
-    if view_name == "Angler":
-        cam_pos = (
-            -max_time,  # x
-            1.2 * max_predator,  # y
-            0.7 * max_prey  # z
-        )
-        cam_target = (mid_time, mid_predator, -mid_prey)
+    if view_name not in VIEWS:
+        print("Invalid view specified. Falling back to a distant perspective.")
 
-    elif view_name == "Fronter":
-        cam_pos = (
-            2 * max_time,
-            mid_predator,
-            -mid_prey
-        )
-        cam_target = (mid_time, mid_predator, -mid_prey)
+    # The presets live in render.camera_pose so headless renders use the same views
+    cam_pos, cam_target = camera_pose(view_name, g_bounds)
+    _set_camera_from_position_and_target(g_camera, cam_pos, cam_target)
 
-    elif view_name == "Sider":
-        cam_pos = (
-            mid_time,
-            mid_predator,
-            2 * max_prey
-        )
-        cam_target = (mid_time, mid_predator, -mid_prey)
+_SHARED_LINE_VERTEX = """
+attribute vec3 a_position;
+// Maps a (time, prey, predator) row to the panel's x, y, z; rows multiply on the left, as in vispy transforms
+uniform mat4 u_axes;
+varying float v_time;
 
-    elif view_name == "Topper":
-        cam_pos = (
-            mid_time,
-            3 * max_predator,
-            -mid_prey
-        )
-        cam_target = (mid_time, mid_predator, -mid_prey)
+void main() {
+    v_time = a_position.x;
+    gl_Position = $transform(vec4(a_position, 1.0) * u_axes);
+}
+"""
 
-    else:
-        print("Invalid view specified. Falling back to a distant perspective.")
-        cam_pos = (
-            2 * max_time,
-            2 * max_predator,
-            -2 * max_prey
-        )
-        cam_target = (mid_time, mid_predator, -mid_prey)
+_SHARED_LINE_FRAGMENT = """
+uniform vec2 u_time_range;
+uniform vec4 u_color;
+varying float v_time;
 
-    _set_camera_from_position_and_target(g_camera, cam_pos, cam_target)
+void main() {
+    if (v_time < u_time_range.x || v_time > u_time_range.y)
+        discard;
+    gl_FragColor = u_color;
+}
+"""
+
+# Column picks for PlotSession panels, as (x, y, z) indices into (time, prey, predator); None leaves an axis at 0
+PANELS = {
+    "3D": (0, 1, 2),
+    "Prey vs Time": (0, 1, None),
+    "Predator vs Time": (0, 2, None),
+    "Phase plane": (1, 2, None),
+}
+
+def _axes_matrix(columns):
+    matrix = np.zeros((4, 4), dtype=np.float32)
+    for axis, column in enumerate(columns):
+        if column is not None:
+            matrix[column, axis] = 1
+    matrix[3, 3] = 1
+    # GLSL reads matrices column by column, so the transpose makes `row * u_axes` apply `matrix` as written
+    return matrix.T
+
+class SharedLineVisual(Visual):
+    # A line strip over a VertexBuffer that other SharedLines may also draw: each picks its axes with a matrix
+    # uniform and only shows the rows inside its time range, so every panel reads the same GPU data and brushing
+    # only changes uniforms
+    def __init__(self, buffer, columns=(0, 1, 2), color=(1, 1, 1, 1)):
+        Visual.__init__(self, vcode=_SHARED_LINE_VERTEX, fcode=_SHARED_LINE_FRAGMENT)
+        self._draw_mode = 'line_strip'
+        self.set_gl_state('translucent', depth_test=False)
+        self.shared_program['a_position'] = buffer
+        self.shared_program['u_axes'] = _axes_matrix(columns)
+        self.shared_program['u_color'] = color
+        self.set_time_range(-np.inf, np.inf)
+
+    def set_time_range(self, start, stop):
+        # Infinite bounds do not survive the trip to the GPU everywhere, so the full range uses the float32 limits
+        limit = float(np.finfo(np.float32).max)
+        self.shared_program['u_time_range'] = (max(start, -limit), min(stop, limit))
+        self.update()
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+SharedLine = vispy.scene.visuals.create_visual_node(SharedLineVisual)
+
+class PlotSession:
+    # The 3D view beside its 2D projections, all drawn from one vertex buffer. Shift-drag across a time panel to
+    # highlight that time range in every panel; double-click to clear it. Several sessions can be open at once.
+    def __init__(self, data, labels=("Time", "Prey", "Predator"), size=(1200, 800), show=True):
+        self.canvas = vispy.scene.SceneCanvas(keys='interactive', show=show, bgcolor='black', size=size)
+        self.full_data, vertices = prepare_graph_data(data, LOD_VERTICES_PER_PIXEL * size[0])
+        self.bounds = tuple(value for column in self.full_data.T for value in (column.min(), column.max()))
+        self.time_range = None
+
+        with profiling.phase("upload"):
+            self.buffer = gloo.VertexBuffer(vertices)
+
+        grid = self.canvas.central_widget.add_grid(spacing=4)
+        self.views = {}
+        # Each panel draws the buffer twice: the whole run dimmed while a range is brushed, and the brushed range
+        # on top, so the highlight stays visible where the curve crosses itself
+        self.context_lines = {}
+        self.lines = {}
+        for position, (name, columns) in enumerate(PANELS.items()):
+            view = grid.add_view(row=position // 2, col=position % 2, border_color=(0.3, 0.3, 0.3, 1))
+            self.context_lines[name] = SharedLine(self.buffer, columns, (0.35, 0.35, 0.35, 1), parent=view.scene)
+            self.context_lines[name].visible = False
+            self.lines[name] = SharedLine(self.buffer, columns, parent=view.scene)
+            if None in columns:
+                view.camera = vispy.scene.cameras.PanZoomCamera()
+                x, y = (self.bounds[2 * column:2 * column + 2] for column in columns[:2])
+                view.camera.set_range(x=x, y=y)
+                title = name.replace("Prey", labels[1]).replace("Predator", labels[2]).replace("Time", labels[0])
+                visuals.Text(title, parent=view, pos=(10, 20), anchor_x='left', anchor_y='bottom', color='white',
+                             font_size=10)
+            else:
+                view.camera = vispy.scene.cameras.TurntableCamera(fov=75)
+                _update_axes(_add_axes(view, labels), self.bounds)
+            self.views[name] = view
+        self.set_camera_view("Angler")
+
+        self._brush_start = None
+        self.canvas.events.mouse_press.connect(self._on_mouse_press)
+        self.canvas.events.mouse_move.connect(self._on_mouse_move)
+        self.canvas.events.mouse_release.connect(self._on_mouse_release)
+        self.canvas.events.mouse_double_click.connect(lambda event: self.set_time_range(None))
+        _profile_draws(self.canvas)
+
+    def set_camera_view(self, view_name):
+        if view_name not in VIEWS:
+            print("Invalid view specified. Falling back to a distant perspective.")
+        _set_camera_from_position_and_target(self.views["3D"].camera, *camera_pose(view_name, self.bounds))
+
+    def set_time_range(self, time_range):
+        # (start, stop) highlights those times in every panel; None shows the whole run
+        self.time_range = None if time_range is None else (min(time_range), max(time_range))
+        start, stop = self.time_range or (-np.inf, np.inf)
+        for name, line in self.lines.items():
+            line.set_time_range(start, stop)
+            self.context_lines[name].visible = self.time_range is not None
+
+    def _time_at(self, position):
+        # Time under the cursor when it is over a panel whose x axis is time
+        for name, view in self.views.items():
+            if PANELS[name][0] != 0 or name == "3D":
+                continue
+            x, y = self.canvas.scene.node_transform(view).map(position)[:2]
+            if 0 <= x <= view.size[0] and 0 <= y <= view.size[1]:
+                return self.canvas.scene.node_transform(view.scene).map(position)[0]
+        return None
+
+    def _on_mouse_press(self, event):
+        self._brush_start = self._time_at(event.pos) if 'Shift' in [key.name for key in event.modifiers] else None
+
+    def _on_mouse_move(self, event):
+        if self._brush_start is None or not event.is_dragging:
+            return
+        time = self._time_at(event.pos)
+        if time is not None:
+            self.set_time_range((self._brush_start, time))
+
+    def _on_mouse_release(self, event):
+        self._brush_start = None
+
+def draw_linked(data, labels=("Time", "Prey", "Predator")):
+    session = PlotSession(data, labels)
+    vispy.app.run()
+    return session
 
 def main():
+    if len(sys.argv) > 1:
+        draw_graph(sys.argv[1])
+        return
+
     data = np.column_stack(
         (np.linspace(0, 25, 2500), np.sin(np.linspace(0, 25, 2500)), np.cos(np.linspace(0, 25, 2500))))
     draw_graph(data)
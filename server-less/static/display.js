@@ -1,4 +1,5 @@
 import {setUpEuler, setUpPreyPredator, setUpRungeKutta} from "./simulation.js";
+import {loadPrecomputed} from "./precomputed.js";
 
 const helpIcon = document.getElementById("help-icon");
 const helpModal = document.getElementById("help-modal");
@@ -21,7 +22,7 @@ let globalPredatorLetter = "";
 
 let error = false;
 
-function runSimulation() {
+async function runSimulation() {
     try {
         const preyEquation = document.getElementById("prey_equation").value;
         const predatorEquation = document.getElementById("predator_equation").value;
@@ -82,7 +83,18 @@ function runSimulation() {
             return;
         }
 
-        const result = simulationSetup.calculatePoints();
+        // A precomputed tile saves integrating long runs on slow devices; anything off its grid is computed here
+        const result = await loadPrecomputed({
+            method,
+            prey_growth_rate: prey.growthRate,
+            prey_control_rate: prey.controlRate,
+            predator_growth_rate: predator.growthRate,
+            predator_control_rate: predator.controlRate,
+            time_step: timeStep,
+            final_time: finalTime,
+            initial_prey_population: initialPreyPopulation,
+            initial_predator_population: initialPredatorPopulation,
+        }) || simulationSetup.calculatePoints();
 
         if (!result.length) {
             showAlert("Simulation produced no valid results.");
@@ -381,8 +393,8 @@ function printTable(data, preyLetter, predatorLetter) {
     tableContainer.appendChild(table);
 }
 
-function generateData() {
-    const simulationResult = runSimulation();
+async function generateData() {
+    const simulationResult = await runSimulation();
 
     if (!simulationResult || typeof simulationResult !== "object") {
         console.log("simulationResult is wrong");
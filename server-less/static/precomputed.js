@@ -0,0 +1,84 @@
+// Trajectories built ahead of time by local-install/precompute.py. Anything off its grid returns null and is
+// computed in the browser as before.
+const PRECOMPUTED_URL = "static/precomputed/";
+const FORMAT_VERSION = 1;
+const COLUMNS = 4;
+const TOLERANCE = 1e-9;
+
+let indexPromise = null;
+const tilePromises = new Map();
+
+function loadIndex() {
+    if (!indexPromise) {
+        indexPromise = fetch(PRECOMPUTED_URL + "index.json")
+            .then(response => response.ok ? response.json() : null)
+            .then(index => index && index.version === FORMAT_VERSION ? index : null)
+            .catch(() => null);
+    }
+    return indexPromise;
+}
+
+function loadTile(file) {
+    if (!tilePromises.has(file)) {
+        // Tiles are gzip files; without DecompressionStream the browser just computes the run itself
+        const promise = typeof DecompressionStream === "undefined" ? Promise.resolve(null) :
+            fetch(PRECOMPUTED_URL + file)
+                .then(response => response.ok ?
+                    new Response(response.body.pipeThrough(new DecompressionStream("gzip"))).arrayBuffer() : null)
+                .catch(() => null);
+        tilePromises.set(file, promise);
+    }
+    return tilePromises.get(file);
+}
+
+function findValue(values, value) {
+    if (typeof value === "string") return values.indexOf(value);
+    return values.findIndex(candidate => Math.abs(candidate - value) <= TOLERANCE * Math.max(1, Math.abs(value)));
+}
+
+// Rows of [time, prey, dPrey, predator, dPredator] like calculatePoints(), or null when the parameters are not
+// on the precomputed grid. `parameters` is keyed by the index's axis names.
+export async function loadPrecomputed(parameters) {
+    const index = await loadIndex();
+    if (!index) return null;
+
+    let tile = 0;
+    let run = 0;
+    let runs = 1;
+    for (const [name, values] of Object.entries(index.axes)) {
+        const position = findValue(values, parameters[name]);
+        if (position < 0) return null;
+
+        if (index.tile_axes.includes(name)) {
+            run = run * values.length + position;
+            runs *= values.length;
+        } else {
+            tile = tile * values.length + position;
+        }
+    }
+
+    const {file, steps} = index.tiles[tile];
+    const buffer = await loadTile(file);
+    if (!buffer) return null;
+
+    // Layout: offsets and scales (runs x 4 float32 each), then runs x 4 x steps uint16 differences
+    const offsets = new Float32Array(buffer, run * COLUMNS * 4, COLUMNS);
+    const scales = new Float32Array(buffer, (runs + run) * COLUMNS * 4, COLUMNS);
+    if (scales.some(isNaN)) return null;
+    const codes = new Uint16Array(buffer, runs * COLUMNS * 8 + run * COLUMNS * steps * 2, COLUMNS * steps);
+
+    const results = new Array(steps);
+    let time = index.start_time;
+    const running = new Uint16Array(COLUMNS);
+    for (let i = 0; i < steps; i++) {
+        if (i) time += parameters.time_step;
+        const row = [time];
+        for (let column = 0; column < COLUMNS; column++) {
+            // Uint16Array wraps like the Python side's uint16 differences
+            running[column] += codes[column * steps + i];
+            row.push(offsets[column] + running[column] * scales[column]);
+        }
+        results[i] = row;
+    }
+    return results;
+}